@@ -1,30 +1,283 @@
-from flask import Flask, request, render_template, redirect, url_for, session, flash, jsonify
+from flask import Flask, request, render_template, redirect, url_for, session, flash, jsonify, g, make_response, send_file, send_from_directory, abort
+from flask import before_render_template, template_rendered
+import click
 import sqlite3 as sql
 import os
-from datetime import datetime
-from models import Database
+import json
+import base64
+import hashlib
+import mimetypes
+import re
+import time
+import logging
+from logging.handlers import RotatingFileHandler
+from datetime import datetime, timezone
+from functools import wraps
+from markupsafe import Markup, escape
+from assets import AssetPipeline
+from cache import ResponseCache, UserCache
+from compression import WBITS, CompressionMiddleware, etag_for_encoding
+from passwords import PasswordHasher
+from importer import ImportQueue, StudentImporter
+import exporter
+from metrics import QueryLog, RequestMetrics, SlowQueryLog, server_timing
+from sessions import MemorySessionStore, SQLiteSessionStore, ServerSessionInterface
+from templating import make_bytecode_cache, precompile
+from images import ImageStore, is_hashed
+from enrollment import (COUNTS_QUERY, DISCIPLINA_QUERY, DISCIPLINAS_SELECT, ROSTER_SELECT, TEACHING_LOADS_QUERY,
+                        EnrollmentService, parse_ids)
+from ratelimit import MemoryRateLimitStore, RateLimiter, SQLiteRateLimitStore
+from models import (Database, Repository, StatsService, FEED_SELECT, STORAGE_PROFILE, ADMIN_DASHBOARD_QUERY,
+                    AREA_ALUNO_QUERY, FEED_DESTAQUES_QUERY, FEED_RECENTES_QUERY)
 
 app = Flask(__name__)
 app.secret_key = 'escola_colaco_secret_key_2024'
 app.config['DATABASE'] = 'escola_colaco.db'
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 2 * 1024 * 1024  # 2MB
+app.config['DB_POOL_SIZE'] = 5
+app.config['DB_POOL_TIMEOUT'] = 5.0  # segundos
+app.config['DB_PRAGMAS'] = dict(STORAGE_PROFILE)
+app.config['PAGE_SIZE'] = 20
+app.config['MAX_PAGE_SIZE'] = 100
+app.config['SEARCH_PAGE_SIZE'] = 10
+app.config['SEARCH_MAX_PAGES'] = 50
+app.config['STATS_TTL'] = 30.0  # segundos
+app.config['PAGE_CACHE_ENABLED'] = True
+app.config['PAGE_CACHE_MAX_BYTES'] = 16 * 1024 * 1024
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600  # arquivos versionados nunca mudam
+app.config['COMPRESS_MIN_SIZE'] = 1024  # bytes
+app.config['COMPRESS_LEVEL'] = 6
+app.config['PASSWORD_METHOD'] = 'scrypt:32768:8:1'  # ou 'pbkdf2:sha256:600000'
+app.config['PASSWORD_WORKERS'] = 2
+app.config['PASSWORD_MAX_PENDING'] = 32
+app.config['IMPORT_CHUNK_SIZE'] = 1000
+app.config['IMPORT_HASH_PROCESSES'] = None  # processos para os hashes da importação (None = um por CPU)
+app.config['EXPORT_BATCH_SIZE'] = 1000
+app.config['METRICS_ENABLED'] = True  # SQL/templates por requisição e histogramas em /metrics
+app.config['SERVER_TIMING'] = True  # cabeçalho Server-Timing nas respostas
+app.config['SLOW_QUERY_THRESHOLD'] = 0.05  # segundos; exige METRICS_ENABLED
+app.config['SLOW_QUERY_CAPACITY'] = 200  # consultas distintas guardadas em memória
+app.config['SLOW_QUERY_LOG_FILE'] = None  # ex.: 'slow_queries.log' (rotacionado)
+app.config['SESSION_BACKEND'] = 'sqlite'  # 'sqlite', 'memory' ou None (cookie assinado do Flask)
+app.config['SESSION_IDLE_TIMEOUT'] = 8 * 3600  # segundos sem uso até a sessão expirar no servidor
+app.config['SESSION_SWEEP_INTERVAL'] = 300  # segundos entre limpezas de sessões vencidas
+app.config['USER_CACHE_SIZE'] = 1024
+app.config['USER_CACHE_TTL'] = 60.0  # segundos; alterações feitas por outro processo
+app.config['TEMPLATE_BYTECODE_CACHE'] = 'filesystem'  # 'filesystem', 'memory' ou None
+app.config['TEMPLATE_CACHE_DIR'] = os.path.join(app.root_path, '.jinja_cache')
+app.config['IMAGE_WORKERS'] = 2  # threads gerando as variantes redimensionadas
+app.config['ENROLL_BATCH_SIZE'] = 500  # alunos por INSERT/DELETE nas matrículas em lote
+# 'memory' (por processo, sem tocar no banco), 'sqlite' (compartilhado entre workers) ou None
+app.config['RATE_LIMIT_BACKEND'] = 'memory'
+app.config['RATE_LIMIT_MAX_KEYS'] = 100_000  # baldes guardados em memória
+app.config['RATE_LIMITS'] = {  # nome: (tentativas em rajada, segundos para recarregar todas)
+    'login_ip': (30, 60),  # folga para uma sala inteira atrás do mesmo NAT
+    'login_user': (10, 300),
+    'contato_ip': (5, 600),
+}
+
+# Compressão gzip/deflate das respostas de texto
+app.wsgi_app = CompressionMiddleware(app.wsgi_app,
+                                     min_size=app.config['COMPRESS_MIN_SIZE'],
+                                     level=app.config['COMPRESS_LEVEL'])
 
 # Inicializar banco de dados
-db_manager = Database(app.config['DATABASE'])
+db_manager = Database(app.config['DATABASE'],
+                      pool_size=app.config['DB_POOL_SIZE'],
+                      pool_timeout=app.config['DB_POOL_TIMEOUT'],
+                      pragmas=app.config['DB_PRAGMAS'])
+stats = StatsService(ttl=app.config['STATS_TTL'])
+page_cache = ResponseCache(max_bytes=app.config['PAGE_CACHE_MAX_BYTES'])
+# Imagens das notícias; quando as variantes ficam prontas, as páginas em cache passam a usá-las
+images = ImageStore(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']),
+                    workers=app.config['IMAGE_WORKERS'],
+                    on_ready=lambda nome: page_cache.invalidate('news'))
+users = UserCache(max_entries=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+enrollments = EnrollmentService(db_manager, batch_size=app.config['ENROLL_BATCH_SIZE'])
+metrics = RequestMetrics()
+
+def _slow_query_logger():
+    """Arquivo rotacionado com as consultas lentas, se SLOW_QUERY_LOG_FILE estiver definido"""
+    caminho = app.config['SLOW_QUERY_LOG_FILE']
+    if not caminho:
+        return None
+    logger = logging.getLogger('escola_colaco.slow_queries')
+    handler = RotatingFileHandler(caminho, maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger
+
+slow_queries = SlowQueryLog(threshold=app.config['SLOW_QUERY_THRESHOLD'],
+                            capacity=app.config['SLOW_QUERY_CAPACITY'],
+                            logger=_slow_query_logger())
+hasher = PasswordHasher(method=app.config['PASSWORD_METHOD'],
+                        workers=app.config['PASSWORD_WORKERS'],
+                        max_pending=app.config['PASSWORD_MAX_PENDING'])
+
+# Templates compilados reaproveitados entre workers e reinícios
+app.jinja_env.bytecode_cache = make_bytecode_cache(app.config['TEMPLATE_BYTECODE_CACHE'],
+                                                   app.config['TEMPLATE_CACHE_DIR'])
+template_compile_times = {}
+
+def precompile_templates():
+    """Compila todos os templates agora (em vez de no primeiro acesso); devolve {nome: segundos}"""
+    tempos = precompile(app.jinja_env)
+    template_compile_times.update(tempos)
+    return tempos
+
+# Versiona e pré-comprime CSS/JS na inicialização (idempotente)
+asset_pipeline = AssetPipeline(app.static_folder)
+asset_pipeline.build()
 
 def get_db():
-    return db_manager.get_connection()
+    """Conexão do pool vinculada ao contexto da aplicação"""
+    if 'db' not in g:
+        g.db = db_manager.get_connection()
+        g.db.query_log = g.get('query_log')
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.query_log = None
+        db_manager.release_connection(conn)
+
+# Instrumentação: SQL e templates cronometrados por requisição
+@app.before_request
+def start_metrics():
+    if app.config['METRICS_ENABLED']:
+        g.inicio_requisicao = time.perf_counter()
+        g.query_log = QueryLog()
+        g.tempo_templates = 0.0
+        if 'db' in g:
+            # Conexão já aberta ao carregar a sessão
+            g.db.query_log = g.query_log
+
+@before_render_template.connect_via(app)
+def _start_template_timer(sender, template, context, **extra):
+    if 'inicio_requisicao' in g:
+        g.inicio_template = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _stop_template_timer(sender, template, context, **extra):
+    inicio = g.pop('inicio_template', None)
+    if inicio is not None:
+        g.tempo_templates += time.perf_counter() - inicio
+
+@app.after_request
+def record_metrics(response):
+    inicio = g.pop('inicio_requisicao', None)
+    if inicio is None:
+        return response
+    total = time.perf_counter() - inicio
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = server_timing(total, g.query_log, g.tempo_templates)
+    rota = request.url_rule.rule if request.url_rule is not None else '(sem rota)'
+    metrics.observe(rota, request.method, response.status_code, total, g.query_log, g.tempo_templates)
+    for sql_, params, duracao in list(g.query_log.entries):
+        if duracao >= slow_queries.threshold:
+            slow_queries.observe(sql_, params, duracao, rota, explain=_explain_slow_query)
+    return response
+
+def _explain_slow_query(sql_, params):
+    """EXPLAIN QUERY PLAN na conexão da requisição, sem entrar no QueryLog dela"""
+    conn = g.get('db')
+    emprestada = conn is None
+    if emprestada:
+        conn = db_manager.get_connection()
+    log, conn.query_log = conn.query_log, None
+    try:
+        return db_manager.explain(conn, sql_, params)
+    finally:
+        conn.query_log = log
+        if emprestada:
+            db_manager.release_connection(conn)
+
+# Limite de tentativas (token bucket) no login e no contato
+if app.config['RATE_LIMIT_BACKEND'] == 'sqlite':
+    limiter = RateLimiter(SQLiteRateLimitStore(db_manager, get_db), app.config['RATE_LIMITS'])
+elif app.config['RATE_LIMIT_BACKEND'] == 'memory':
+    limiter = RateLimiter(MemoryRateLimitStore(max_keys=app.config['RATE_LIMIT_MAX_KEYS']),
+                          app.config['RATE_LIMITS'])
+else:
+    limiter = None
+
+def check_rate_limit(**chaves):
+    """Segundos que o cliente deve esperar (0 se pode seguir).
+
+    Atrás de um proxy reverso, aplique o ProxyFix para que remote_addr seja o IP real.
+    """
+    if limiter is None:
+        return 0
+    return limiter.hit(**chaves)
+
+def too_many_requests(template, espera):
+    """Resposta 429 com Retry-After, renderizando a própria página do formulário"""
+    flash(f"Muitas tentativas. Tente novamente em {espera} segundo(s).", "error")
+    resposta = make_response(render_template(template), 429)
+    resposta.headers['Retry-After'] = str(espera)
+    return resposta
+
+# Sessões no servidor: o cookie leva só um id opaco
+if app.config['SESSION_BACKEND'] == 'sqlite':
+    app.session_interface = ServerSessionInterface(
+        SQLiteSessionStore(db_manager, get_db, sweep_interval=app.config['SESSION_SWEEP_INTERVAL']),
+        idle_timeout=app.config['SESSION_IDLE_TIMEOUT'])
+elif app.config['SESSION_BACKEND'] == 'memory':
+    app.session_interface = ServerSessionInterface(
+        MemorySessionStore(sweep_interval=app.config['SESSION_SWEEP_INTERVAL']),
+        idle_timeout=app.config['SESSION_IDLE_TIMEOUT'])
+
+def current_user():
+    """Usuário logado (do cache de usuários); None se anônimo, inativo ou removido"""
+    if 'user' not in g:
+        user_id = session.get('user_id')
+        user = users.get(user_id, get_db) if user_id is not None else None
+        if user_id is not None and (user is None or not user.ativo):
+            # Desativado ou removido depois do login: encerra a sessão já
+            session.clear()
+            user = None
+        g.user = user
+    return g.user
+
+def rotate_session():
+    """Troca o id da sessão no servidor (login/logout), se o backend suportar"""
+    session.clear()
+    if hasattr(session, 'regenerate'):
+        session.regenerate()
+
+def end_user_sessions(user_id):
+    """Desloga o usuário em todos os workers (o cache de usuários é por processo).
+
+    Só com sessões no servidor; no cookie assinado vale o USER_CACHE_TTL.
+    """
+    store = getattr(app.session_interface, 'store', None)
+    if store is not None:
+        store.delete_user(user_id)
 
 # Context processor - disponibiliza variáveis para todos os templates
 @app.context_processor
 def inject_user():
+    user = current_user()
+    agora = datetime.now()
     return dict(
-        current_user=session.get('nome'),
-        user_tipo=session.get('tipo'),
-        current_year=datetime.now().year
+        current_user=user.nome if user else None,
+        user_tipo=user.tipo if user else None,
+        current_year=agora.year,
+        now=agora  # usado por editar_aluno.html
     )
 
+# URL versionada de um arquivo estático (cai para /static se não estiver no manifesto)
+@app.template_global()
+def asset_url(filename):
+    versionado = asset_pipeline.resolve(filename)
+    if versionado is None:
+        return url_for('static', filename=filename)
+    return url_for('static_asset', filename=versionado)
+
 # Filtro personalizado para formatar datas
 @app.template_filter('format_date')
 def format_date(value, format='%d/%m/%Y'):
@@ -32,34 +285,213 @@ def format_date(value, format='%d/%m/%Y'):
         return value
     return value.strftime(format)
 
+# Paginação por cursor (keyset): o custo de cada página independe do tamanho da tabela
+def _encode_cursor(valores):
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip('=')
+
+def _decode_cursor(token, tamanho):
+    """Valores do cursor, ou None se ele não tiver `tamanho` valores simples (cursor forjado)"""
+    if not token:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(valores, list) or len(valores) != tamanho:
+        return None
+    if not all(v is None or isinstance(v, (str, int, float)) for v in valores):
+        return None
+    return valores
+
+def keyset_query(select, chave, where=(), descendente=False, cursor=False, voltando=False):
+    """SQL de uma página de `select` ordenado por `chave`; o último parâmetro é o LIMIT"""
+    filtros = list(where)
+    if cursor:
+        operador = '<' if descendente != voltando else '>'
+        filtros.append(f"({', '.join(chave)}) {operador} ({', '.join('?' * len(chave))})")
+    direcao = 'DESC' if descendente != voltando else 'ASC'
+    query = select
+    if filtros:
+        query += " WHERE " + " AND ".join(filtros)
+    return query + " ORDER BY " + ", ".join(f"{coluna} {direcao}" for coluna in chave) + " LIMIT ?"
+
+def keyset_page(conn, select, chave, where=(), params=(), descendente=False):
+    """Executa `select` paginado pelas colunas `chave` (a última deve ser única).
+    
+    Lê os argumentos `depois`, `antes` e `por_pagina` da query string e
+    devolve os itens da página junto com os cursores de próxima/anterior.
+    """
+    por_pagina = request.args.get('por_pagina', app.config['PAGE_SIZE'], type=int)
+    por_pagina = min(max(por_pagina, 1), app.config['MAX_PAGE_SIZE'])
+    depois = _decode_cursor(request.args.get('depois'), len(chave))
+    antes = None if depois else _decode_cursor(request.args.get('antes'), len(chave))
+    cursor = depois or antes
+    voltando = antes is not None
+    
+    valores = list(params)
+    if cursor:
+        valores += cursor
+    else:
+        cursor, voltando = None, False
+    
+    query = keyset_query(select, chave, where, descendente, cursor is not None, voltando)
+    itens = conn.execute(query, valores + [por_pagina + 1]).fetchall()
+    ha_mais = len(itens) > por_pagina
+    itens = itens[:por_pagina]
+    if voltando:
+        itens.reverse()
+    
+    campos = [coluna.split('.')[-1] for coluna in chave]
+    tem_proxima = voltando or ha_mais
+    tem_anterior = ha_mais if voltando else cursor is not None
+    return {
+        'itens': itens,
+        'por_pagina': por_pagina,
+        'proximo': _encode_cursor([itens[-1][c] for c in campos]) if itens and tem_proxima else None,
+        'anterior': _encode_cursor([itens[0][c] for c in campos]) if itens and tem_anterior else None,
+    }
+
+# Listagens paginadas: keyset_page(conn, **LISTA_...) nas rotas e no "flask check-query-plans"
+LISTA_NOTICIAS = dict(select=FEED_SELECT, chave=('data_publicacao', 'id'), descendente=True)
+LISTA_ALUNOS = dict(select="SELECT * FROM users", chave=('nome', 'id'), where=("tipo = 'aluno'",))
+LISTA_DISCIPLINAS = dict(select=DISCIPLINAS_SELECT, chave=('d.nome', 'd.id'))
+LISTA_ROSTER = dict(select=ROSTER_SELECT, chave=('m.aluno_id',), where=("m.disciplina_id = ?",))
+
+# Cache de páginas públicas: só GETs anônimos e sem mensagens flash pendentes
+def cached_page(ttl, tags=()):
+    """Guarda a resposta completa da rota; `tags` pode ser uma função dos argumentos da rota"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if (not app.config['PAGE_CACHE_ENABLED'] or request.method != 'GET'
+                    or 'user_id' in session or session.get('_flashes')):
+                return f(*args, **kwargs)
+            
+            chave = request.full_path
+            pagina = page_cache.get(chave)
+            if pagina is not None:
+                response = app.response_class(pagina.body, status=pagina.status, headers=pagina.headers)
+                response.headers['X-Cache'] = 'HIT'
+                # Mesma regra das rotas: aceita também a ETag da versão comprimida
+                etag = response.get_etag()[0]
+                if etag:
+                    resposta = not_modified(etag, response.last_modified)
+                    if resposta is not None:
+                        return resposta
+                return response.make_conditional(request)
+            
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not session.modified and not response.direct_passthrough:
+                headers = [(k, v) for k, v in response.headers if k.lower() != 'set-cookie']
+                page_cache.set(chave, response.status_code, headers, response.get_data(), ttl,
+                               tags(**kwargs) if callable(tags) else tags)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return decorated_function
+    return decorator
+
+# Respostas condicionais (ETag / Last-Modified), decididas antes de renderizar
+def _etag(*partes):
+    """ETag forte da versão dos dados + URL + usuário (o HTML muda com o login)"""
+    chave = '|'.join(str(p) for p in (*partes, request.full_path, session.get('user_id')))
+    return hashlib.sha1(chave.encode()).hexdigest()
+
+def _parse_timestamp(valor):
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def _last_modified(last_modified):
+    """A ETag muda com o login e a Last-Modified não: só vale para visitantes anônimos"""
+    return None if session.get('user_id') else last_modified
+
+def not_modified(etag, last_modified=None):
+    """Devolve uma resposta 304 se o cliente já tem esta versão, senão None.
+    
+    Com If-None-Match, o If-Modified-Since é ignorado (RFC 9110, 13.1.3).
+    """
+    if session.get('_flashes'):
+        return None
+    last_modified = _last_modified(last_modified)
+    if request.if_none_match:
+        # A versão comprimida sai com "<etag>-gzip": vale se o cliente aceita essa codificação
+        formas = [etag] + [etag_for_encoding(etag, encoding) for encoding in WBITS
+                           if encoding in request.accept_encodings]
+        atual = next((forma for forma in formas if request.if_none_match.contains(forma)), None)
+        etag = atual or etag
+    elif request.if_modified_since and last_modified:
+        atual = last_modified <= request.if_modified_since
+    else:
+        atual = False
+    if not atual:
+        return None
+    return set_validators(app.response_class(status=304), etag, last_modified)
+
+def set_validators(response, etag, last_modified=None):
+    response = make_response(response)
+    response.set_etag(etag)
+    last_modified = _last_modified(last_modified)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+@app.route("/assets/<path:filename>")
+def static_asset(filename):
+    """Serve arquivos versionados já comprimidos, conforme o Accept-Encoding"""
+    caminho, encoding = asset_pipeline.choose(filename, request.accept_encodings)
+    if caminho is None:
+        abort(404)
+    
+    response = send_file(caminho, mimetype=mimetypes.guess_type(filename)[0],
+                         conditional=True, max_age=app.config['ASSET_MAX_AGE'])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = f"public, max-age={app.config['ASSET_MAX_AGE']}, immutable"
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Imagens enviadas: nomes por hash nunca mudam de conteúdo
+@app.route("/uploads/<path:filename>")
+def upload(filename):
+    response = send_from_directory(images.folder, filename, max_age=app.config['ASSET_MAX_AGE'])
+    if is_hashed(filename):
+        response.headers['Cache-Control'] = f"public, max-age={app.config['ASSET_MAX_AGE']}, immutable"
+    return response
+
+@app.template_global()
+def image_sources(nome):
+    """src e srcset de uma imagem de notícia (variantes menores, se já geradas)"""
+    variantes = images.variants_for(nome)
+    if not variantes:
+        return {'src': url_for('upload', filename=nome), 'srcset': ''}
+    return {
+        'src': url_for('upload', filename=variantes[-1][0]),
+        'srcset': ', '.join(f"{url_for('upload', filename=arquivo)} {largura}w" for arquivo, largura in variantes),
+    }
+
 # Rotas Públicas
 @app.route("/")
+@cached_page(ttl=60, tags=('news', 'stats'))
 def index():
     """Página inicial da escola"""
     conn = get_db()
     
     # Notícias em destaque
-    noticias_destaque = conn.execute('''
-        SELECT n.*, u.nome as autor_nome 
-        FROM noticias n 
-        LEFT JOIN users u ON n.autor_id = u.id 
-        WHERE n.destaque = 1
-        ORDER BY n.data_publicacao DESC 
-        LIMIT 3
-    ''').fetchall()
+    noticias_destaque = Repository(conn).news_feed(3, destaque=True)
     
     # Total de alunos e professores
-    total_alunos = conn.execute("SELECT COUNT(*) FROM users WHERE tipo = 'aluno' AND ativo = 1").fetchone()[0]
-    total_professores = conn.execute("SELECT COUNT(*) FROM users WHERE tipo = 'professor' AND ativo = 1").fetchone()[0]
-    
-    conn.close()
+    estatisticas = stats.get(conn)
     
     return render_template("index.html", 
                          noticias=noticias_destaque,
-                         total_alunos=total_alunos,
-                         total_professores=total_professores)
+                         total_alunos=estatisticas['aluno'],
+                         total_professores=estatisticas['professor'])
 
 @app.route("/sobre")
+@cached_page(ttl=3600)
 def sobre():
     """Página sobre a escola"""
     return render_template("sobre.html")
@@ -68,6 +500,9 @@ def sobre():
 def contato():
     """Página de contato"""
     if request.method == "POST":
+        espera = check_rate_limit(contato_ip=request.remote_addr)
+        if espera:
+            return too_many_requests("contato.html", espera)
         nome = request.form.get('nome')
         email = request.form.get('email')
         mensagem = request.form.get('mensagem')
@@ -78,45 +513,116 @@ def contato():
     
     return render_template("contato.html")
 
+# Revisão das notícias e hora (epoch) da última inclusão, edição ou remoção (ETag/Last-Modified)
+NOTICIAS_VALIDADORES_QUERY = '''
+    SELECT (SELECT valor FROM estatisticas WHERE chave = 'noticias_revisao'),
+           (SELECT valor FROM estatisticas WHERE chave = 'noticias_atualizado')
+'''
+
 @app.route("/noticias")
+@cached_page(ttl=120, tags=('news',))
 def noticias():
     """Página de notícias"""
     conn = get_db()
-    noticias_list = conn.execute('''
-        SELECT n.*, u.nome as autor_nome 
-        FROM noticias n 
-        LEFT JOIN users u ON n.autor_id = u.id 
-        ORDER BY n.data_publicacao DESC
-    ''').fetchall()
-    conn.close()
+    revisao, atualizado = conn.execute(NOTICIAS_VALIDADORES_QUERY).fetchone()
+    etag = _etag('noticias', revisao)
+    last_modified = datetime.fromtimestamp(atualizado, timezone.utc) if atualizado else None
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
+    
+    pagina = keyset_page(conn, **LISTA_NOTICIAS)
+    
+    return set_validators(render_template("noticias.html", noticias=pagina['itens'], pagina=pagina),
+                          etag, last_modified)
+
+# Marcadores do snippet(): trocados por <mark> só depois de escapar o texto
+_HL_INICIO, _HL_FIM = '\x02', '\x03'
+
+BUSCA_QUERY = '''
+    SELECT f.id, f.titulo, f.slug, f.data_publicacao, f.autor_nome,
+           highlight(noticias_fts, 0, ?, ?) as titulo_destacado,
+           snippet(noticias_fts, 1, ?, ?, '…', 24) as trecho
+    FROM noticias_fts
+    JOIN noticias_feed f ON f.id = noticias_fts.rowid
+    WHERE noticias_fts MATCH ?
+    ORDER BY bm25(noticias_fts, 10.0, 1.0)
+    LIMIT ? OFFSET ?
+'''
+
+def _fts_query(termos):
+    """Converte o texto digitado em consulta FTS5 segura (todas as palavras, última como prefixo)"""
+    palavras = re.findall(r'\w+', termos)
+    if not palavras:
+        return None
+    return ' '.join(f'"{p}"' for p in palavras) + '*'
+
+def _highlight(trecho):
+    return Markup(str(escape(trecho)).replace(_HL_INICIO, '<mark>').replace(_HL_FIM, '</mark>'))
+
+@app.route("/noticias/busca")
+def busca_noticias():
+    """Busca textual nas notícias, ordenada por relevância (bm25)"""
+    termos = request.args.get('q', '').strip()
+    pagina = min(max(request.args.get('pagina', 1, type=int), 1), app.config['SEARCH_MAX_PAGES'])
+    por_pagina = app.config['SEARCH_PAGE_SIZE']
+    consulta = _fts_query(termos)
+    
+    resultados = []
+    if consulta:
+        conn = get_db()
+        resultados = conn.execute(BUSCA_QUERY, (_HL_INICIO, _HL_FIM, _HL_INICIO, _HL_FIM, consulta,
+              por_pagina + 1, (pagina - 1) * por_pagina)).fetchall()
     
-    return render_template("noticias.html", noticias=noticias_list)
+    ha_mais = len(resultados) > por_pagina and pagina < app.config['SEARCH_MAX_PAGES']
+    resultados = [dict(r, titulo_destacado=_highlight(r['titulo_destacado']), trecho=_highlight(r['trecho']))
+                  for r in resultados[:por_pagina]]
+    return render_template("busca.html", termos=termos, resultados=resultados,
+                           pagina=pagina, ha_mais=ha_mais)
+
+# Sem edição desde a publicação, atualizado_em ainda é NULL
+NOTICIA_VERSAO_QUERY = ("SELECT versao, coalesce(atualizado_em, data_publicacao) AS atualizado_em "
+                        "FROM noticias WHERE id = ?")
+NOTICIA_DETALHE_QUERY = '''
+    SELECT n.*, f.autor_nome, f.slug
+    FROM noticias n
+    LEFT JOIN noticias_feed f ON f.id = n.id
+    WHERE n.id = ?
+'''
 
 @app.route("/noticia/<int:noticia_id>")
-def noticia_detalhe(noticia_id):
-    """Página de detalhe da notícia"""
+@app.route("/noticia/<int:noticia_id>/<slug>")
+@cached_page(ttl=300, tags=lambda noticia_id, slug=None: ('news', f'news:{noticia_id}'))
+def noticia_detalhe(noticia_id, slug=None):
+    """Página de detalhe da notícia (o slug na URL é só legibilidade; vale o id)"""
     conn = get_db()
-    noticia = conn.execute('''
-        SELECT n.*, u.nome as autor_nome 
-        FROM noticias n 
-        LEFT JOIN users u ON n.autor_id = u.id 
-        WHERE n.id = ?
-    ''', (noticia_id,)).fetchone()
-    conn.close()
+    versao = conn.execute(NOTICIA_VERSAO_QUERY, (noticia_id,)).fetchone()
+    if versao:
+        etag = _etag('noticia', noticia_id, versao['versao'])
+        last_modified = _parse_timestamp(versao['atualizado_em'])
+        response = not_modified(etag, last_modified)
+        if response is not None:
+            return response
+    
+    noticia = conn.execute(NOTICIA_DETALHE_QUERY, (noticia_id,)).fetchone()
     
     if not noticia:
         flash("Notícia não encontrada.", "error")
         return redirect(url_for('noticias'))
     
-    return render_template("noticia_detalhe.html", noticia=noticia)
+    return set_validators(render_template("noticia_detalhe.html", noticia=noticia),
+                          etag, last_modified)
 
 # Sistema de Autenticação
+LOGIN_QUERY = "SELECT * FROM users WHERE username = ? AND ativo = 1"
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     """Página de login"""
     # Se já está logado, redireciona para a área apropriada
-    if 'user_id' in session:
-        if session['tipo'] in ['admin', 'professor']:
+    user = current_user()
+    if user is not None:
+        if user.tipo in ['admin', 'professor']:
             return redirect(url_for('admin_dashboard'))
         else:
             return redirect(url_for('area_aluno'))
@@ -125,21 +631,42 @@ def login():
         username = request.form.get("username", "").strip()
         password = request.form.get("password", "")
         
+        # Antes de qualquer consulta ou verificação de senha
+        espera = check_rate_limit(login_ip=request.remote_addr, login_user=username.lower())
+        if espera:
+            return too_many_requests("login.html", espera)
+        
         if not username or not password:
             flash("Preencha todos os campos.", "error")
         else:
             conn = get_db()
-            user = conn.execute(
-                "SELECT * FROM users WHERE username = ? AND ativo = 1", (username,)
-            ).fetchone()
-            conn.close()
+            user = conn.execute(LOGIN_QUERY, (username,)).fetchone()
+            # Devolve a conexão ao pool enquanto a senha é verificada
+            release_db(None)
+            
+            try:
+                valida, rehash = hasher.verify(user["password"] if user else None, password)
+            except TimeoutError:
+                flash("Muitas tentativas de login no momento. Tente novamente.", "error")
+                return render_template("login.html"), 503
             
-            if user and user["password"] == password:
+            if valida and rehash:
+                # Migração gradual: texto puro ou custo antigo vira hash atual.
+                # O hash é calculado antes: a transação segura o lock de escrita
+                try:
+                    novo_hash = hasher.hash(password)
+                except TimeoutError:
+                    novo_hash = None  # fila cheia: a senha é atualizada num próximo login
+                if novo_hash is not None:
+                    conn = get_db()
+                    with db_manager.transaction(conn):
+                        conn.execute("UPDATE users SET password = ? WHERE id = ? AND password = ?",
+                                     (novo_hash, user['id'], user['password']))
+            
+            if valida:
+                # Só o id vai para a sessão; nome e tipo vêm do cache de usuários
+                rotate_session()
                 session['user_id'] = user['id']
-                session['username'] = user['username']
-                session['tipo'] = user['tipo']
-                session['nome'] = user['nome']
-                session['email'] = user['email']
                 
                 flash(f"Bem-vindo(a), {user['nome']}!", "success")
                 
@@ -155,7 +682,7 @@ def login():
 @app.route("/logout")
 def logout():
     """Faz logout do usuário"""
-    session.clear()
+    rotate_session()
     flash("Logout realizado com sucesso.", "info")
     return redirect(url_for('index'))
 
@@ -165,14 +692,14 @@ def login_required(tipos_permitidos=None):
         tipos_permitidos = ['admin', 'professor', 'aluno']
     
     def decorator(f):
-        from functools import wraps
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            if 'user_id' not in session:
+            user = current_user()
+            if user is None:
                 flash("Você precisa fazer login para acessar esta página.", "error")
                 return redirect(url_for('login'))
             
-            if session['tipo'] not in tipos_permitidos:
+            if user.tipo not in tipos_permitidos:
                 flash("Acesso não autorizado.", "error")
                 return redirect(url_for('index'))
             
@@ -185,37 +712,17 @@ def login_required(tipos_permitidos=None):
 @login_required(['aluno'])
 def area_aluno():
     """Área restrita do aluno"""
-    conn = get_db()
-    
-    # Dados do aluno
-    aluno = conn.execute(
-        "SELECT * FROM users WHERE id = ?", (session['user_id'],)
-    ).fetchone()
-    
-    # Matrículas do aluno
-    matriculas = conn.execute('''
-        SELECT d.nome, d.descricao, u.nome as professor_nome, m.data_matricula
-        FROM matriculas m
-        JOIN disciplinas d ON m.disciplina_id = d.id
-        JOIN users u ON d.professor_id = u.id
-        WHERE m.aluno_id = ? AND m.status = 'ativo'
-    ''', (session['user_id'],)).fetchall()
-    
-    # Notícias recentes
-    noticias_recentes = conn.execute('''
-        SELECT n.*, u.nome as autor_nome 
-        FROM noticias n 
-        LEFT JOIN users u ON n.autor_id = u.id 
-        ORDER BY n.data_publicacao DESC 
-        LIMIT 5
-    ''').fetchall()
-    
-    conn.close()
+    # Dados do aluno, matrículas ativas e notícias recentes
+    painel = Repository(get_db()).area_aluno(session['user_id'])
+    if painel is None:
+        session.clear()
+        flash("Você precisa fazer login para acessar esta página.", "error")
+        return redirect(url_for('login'))
     
     return render_template("area_aluno.html", 
-                         aluno=aluno, 
-                         matriculas=matriculas,
-                         noticias=noticias_recentes)
+                         aluno=painel.aluno, 
+                         matriculas=painel.matriculas,
+                         noticias=painel.noticias)
 
 # Área Administrativa
 @app.route("/admin")
@@ -225,37 +732,18 @@ def admin_dashboard():
     conn = get_db()
     
     # Estatísticas
-    total_alunos = conn.execute("SELECT COUNT(*) FROM users WHERE tipo = 'aluno' AND ativo = 1").fetchone()[0]
-    total_professores = conn.execute("SELECT COUNT(*) FROM users WHERE tipo = 'professor' AND ativo = 1").fetchone()[0]
-    total_disciplinas = conn.execute("SELECT COUNT(*) FROM disciplinas").fetchone()[0]
-    total_noticias = conn.execute("SELECT COUNT(*) FROM noticias").fetchone()[0]
-    
-    # Notícias recentes
-    noticias_recentes = conn.execute('''
-        SELECT n.*, u.nome as autor_nome 
-        FROM noticias n 
-        LEFT JOIN users u ON n.autor_id = u.id 
-        ORDER BY n.data_publicacao DESC 
-        LIMIT 5
-    ''').fetchall()
-    
-    # Últimos alunos cadastrados
-    ultimos_alunos = conn.execute('''
-        SELECT * FROM users 
-        WHERE tipo = 'aluno' 
-        ORDER BY created_at DESC 
-        LIMIT 5
-    ''').fetchall()
+    estatisticas = stats.get(conn)
     
-    conn.close()
+    # Notícias recentes e últimos alunos cadastrados
+    painel = Repository(conn).admin_dashboard()
     
     return render_template("admin/dashboard.html",
-                         total_alunos=total_alunos,
-                         total_professores=total_professores,
-                         total_disciplinas=total_disciplinas,
-                         total_noticias=total_noticias,
-                         noticias=noticias_recentes,
-                         ultimos_alunos=ultimos_alunos)
+                         total_alunos=estatisticas['aluno'],
+                         total_professores=estatisticas['professor'],
+                         total_disciplinas=estatisticas['disciplinas'],
+                         total_noticias=estatisticas['noticias'],
+                         noticias=painel.noticias,
+                         ultimos_alunos=painel.ultimos_alunos)
 
 # Gerenciamento de Alunos
 @app.route("/admin/alunos")
@@ -263,14 +751,9 @@ def admin_dashboard():
 def admin_alunos():
     """Lista de alunos"""
     conn = get_db()
-    alunos = conn.execute('''
-        SELECT * FROM users 
-        WHERE tipo = 'aluno' 
-        ORDER BY nome
-    ''').fetchall()
-    conn.close()
+    pagina = keyset_page(conn, **LISTA_ALUNOS)
     
-    return render_template("admin/alunos.html", alunos=alunos)
+    return render_template("admin/alunos.html", alunos=pagina['itens'], pagina=pagina)
 
 @app.route("/admin/alunos/cadastrar", methods=["GET", "POST"])
 @login_required(['admin', 'professor'])
@@ -288,22 +771,66 @@ def cadastrar_aluno():
         if not nome or not username or not password:
             flash("Preencha todos os campos obrigatórios.", "error")
         else:
+            try:
+                password = hasher.hash(password)
+            except TimeoutError:
+                flash("Servidor ocupado no momento. Tente novamente em instantes.", "error")
+                return render_template("admin/cadastrar_aluno.html"), 503
             conn = get_db()
             try:
-                conn.execute('''
-                    INSERT INTO users (nome, username, password, tipo, email, telefone, endereco, data_nascimento)
-                    VALUES (?, ?, ?, 'aluno', ?, ?, ?, ?)
-                ''', (nome, username, password, email, telefone, endereco, data_nascimento))
-                conn.commit()
-                conn.close()
+                with db_manager.transaction(conn):
+                    conn.execute('''
+                        INSERT INTO users (nome, username, password, tipo, email, telefone, endereco, data_nascimento)
+                        VALUES (?, ?, ?, 'aluno', ?, ?, ?, ?)
+                    ''', (nome, username, password, email, telefone, endereco, data_nascimento))
+                stats.invalidate()
+                page_cache.invalidate('stats')
                 flash("Aluno cadastrado com sucesso!", "success")
                 return redirect(url_for('admin_alunos'))
             except sql.IntegrityError:
                 flash("Username já existe.", "error")
-                conn.close()
     
     return render_template("admin/cadastrar_aluno.html")
 
+def _student_importer():
+    return StudentImporter(db_manager, hasher, chunk_size=app.config['IMPORT_CHUNK_SIZE'],
+                           processes=app.config['IMPORT_HASH_PROCESSES'])
+
+def _import_done(relatorio):
+    if relatorio['importados']:
+        stats.invalidate()
+        page_cache.invalidate('stats')
+
+# Uploads do painel: o hash das senhas leva minutos em turmas grandes, então roda fora da requisição
+imports = ImportQueue(db_manager, _student_importer, on_done=_import_done)
+
+@app.route("/admin/alunos/importar", methods=["GET", "POST"])
+@login_required(['admin'])
+def importar_alunos():
+    """Importação em lote de alunos a partir de CSV ou JSONL"""
+    if request.method == "POST":
+        arquivo = request.files.get("arquivo")
+        if not arquivo or not arquivo.filename:
+            flash("Selecione um arquivo CSV ou JSONL.", "error")
+        else:
+            formato = 'jsonl' if arquivo.filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+            importacao_id = imports.submit(arquivo, formato)
+            flash("Arquivo recebido. A importação continua em segundo plano.", "success")
+            return redirect(url_for('importacao_alunos', importacao_id=importacao_id))
+    
+    return render_template("admin/importar_alunos.html", importacao=None)
+
+@app.route("/admin/alunos/importar/<int:importacao_id>")
+@login_required(['admin'])
+def importacao_alunos(importacao_id):
+    """Andamento e relatório de uma importação enviada pelo painel"""
+    importacao = imports.get(get_db(), importacao_id)
+    if importacao is None:
+        flash("Importação não encontrada.", "error")
+        return redirect(url_for('importar_alunos'))
+    
+    return render_template("admin/importar_alunos.html", importacao=importacao)
+
 @app.route("/admin/alunos/editar/<int:aluno_id>", methods=["GET", "POST"])
 @login_required(['admin', 'professor'])
 def editar_aluno(aluno_id):
@@ -314,7 +841,6 @@ def editar_aluno(aluno_id):
     ).fetchone()
     
     if not aluno:
-        conn.close()
         flash("Aluno não encontrado.", "error")
         return redirect(url_for('admin_alunos'))
     
@@ -331,28 +857,37 @@ def editar_aluno(aluno_id):
         if not nome or not username:
             flash("Nome e usuário são obrigatórios.", "error")
         else:
+            if password:
+                try:
+                    password = hasher.hash(password)
+                except TimeoutError:
+                    flash("Servidor ocupado no momento. Tente novamente em instantes.", "error")
+                    return render_template("admin/editar_aluno.html", aluno=aluno), 503
             try:
-                if password:
-                    conn.execute('''
-                        UPDATE users 
-                        SET nome = ?, username = ?, password = ?, email = ?, telefone = ?, endereco = ?, data_nascimento = ?, ativo = ?
-                        WHERE id = ?
-                    ''', (nome, username, password, email, telefone, endereco, data_nascimento, ativo, aluno_id))
-                else:
-                    conn.execute('''
-                        UPDATE users 
-                        SET nome = ?, username = ?, email = ?, telefone = ?, endereco = ?, data_nascimento = ?, ativo = ?
-                        WHERE id = ?
-                    ''', (nome, username, email, telefone, endereco, data_nascimento, ativo, aluno_id))
+                with db_manager.transaction(conn):
+                    if password:
+                        conn.execute('''
+                            UPDATE users 
+                            SET nome = ?, username = ?, password = ?, email = ?, telefone = ?, endereco = ?, data_nascimento = ?, ativo = ?
+                            WHERE id = ?
+                        ''', (nome, username, password, email, telefone, endereco, data_nascimento, ativo, aluno_id))
+                    else:
+                        conn.execute('''
+                            UPDATE users 
+                            SET nome = ?, username = ?, email = ?, telefone = ?, endereco = ?, data_nascimento = ?, ativo = ?
+                            WHERE id = ?
+                        ''', (nome, username, email, telefone, endereco, data_nascimento, ativo, aluno_id))
                 
-                conn.commit()
-                conn.close()
+                users.invalidate(aluno_id)
+                if not ativo:
+                    end_user_sessions(aluno_id)
+                stats.invalidate()
+                page_cache.invalidate('stats')
                 flash("Aluno atualizado com sucesso!", "success")
                 return redirect(url_for('admin_alunos'))
             except sql.IntegrityError:
                 flash("Username já usado por outro usuário.", "error")
     
-    conn.close()
     return render_template("admin/editar_aluno.html", aluno=aluno)
 
 @app.route("/admin/alunos/deletar/<int:aluno_id>", methods=["POST"])
@@ -360,9 +895,12 @@ def editar_aluno(aluno_id):
 def deletar_aluno(aluno_id):
     """Deletar aluno (apenas admin)"""
     conn = get_db()
-    conn.execute("DELETE FROM users WHERE id = ? AND tipo = 'aluno'", (aluno_id,))
-    conn.commit()
-    conn.close()
+    with db_manager.transaction(conn):
+        conn.execute("DELETE FROM users WHERE id = ? AND tipo = 'aluno'", (aluno_id,))
+    users.invalidate(aluno_id)
+    end_user_sessions(aluno_id)
+    stats.invalidate()
+    page_cache.invalidate('stats')
     flash("Aluno removido com sucesso!", "success")
     return redirect(url_for('admin_alunos'))
 
@@ -370,32 +908,78 @@ def deletar_aluno(aluno_id):
 @app.route("/admin/professores")
 @login_required(['admin'])
 def admin_professores():
-    """Lista de professores (apenas admin)"""
-    conn = get_db()
-    professores = conn.execute('''
-        SELECT * FROM users 
-        WHERE tipo = 'professor' 
-        ORDER BY nome
-    ''').fetchall()
-    conn.close()
+    """Lista de professores com a carga horária de cada um (apenas admin)"""
+    professores = enrollments.teaching_loads(get_db())
     
     return render_template("admin/professores.html", professores=professores)
 
+# Gerenciamento de Disciplinas e Matrículas
+@app.route("/admin/disciplinas")
+@login_required(['admin', 'professor'])
+def admin_disciplinas():
+    """Lista de disciplinas com o total de matrículas de cada uma"""
+    conn = get_db()
+    pagina = keyset_page(conn, **LISTA_DISCIPLINAS)
+    contagens = enrollments.counts(conn, [d['id'] for d in pagina['itens']])
+    
+    return render_template("admin/disciplinas.html", disciplinas=pagina['itens'],
+                           contagens=contagens, pagina=pagina)
+
+@app.route("/admin/disciplinas/<int:disciplina_id>")
+@login_required(['admin', 'professor'])
+def disciplina_alunos(disciplina_id):
+    """Alunos matriculados numa disciplina (paginado pelo id do aluno, na ordem do índice)"""
+    conn = get_db()
+    disciplina = conn.execute(DISCIPLINA_QUERY, (disciplina_id,)).fetchone()
+    if disciplina is None:
+        flash("Disciplina não encontrada.", "error")
+        return redirect(url_for('admin_disciplinas'))
+    
+    pagina = keyset_page(conn, params=(disciplina_id,), **LISTA_ROSTER)
+    
+    return render_template("admin/disciplina_alunos.html", disciplina=disciplina,
+                           contagem=enrollments.counts(conn, [disciplina_id])[disciplina_id],
+                           alunos=pagina['itens'], pagina=pagina)
+
+@app.route("/admin/disciplinas/<int:disciplina_id>/matricular", methods=["POST"])
+@login_required(['admin'])
+def matricular_alunos(disciplina_id):
+    """Matricula em lote os ids de alunos informados (apenas admin)"""
+    ids = parse_ids(request.form.get("aluno_ids"))
+    if not ids:
+        flash("Informe os IDs dos alunos.", "error")
+        return redirect(url_for('disciplina_alunos', disciplina_id=disciplina_id))
+    
+    try:
+        criadas = enrollments.enroll(get_db(), disciplina_id, ids)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for('admin_disciplinas'))
+    
+    ignorados = len(ids) - criadas
+    flash(f"{criadas} aluno(s) matriculado(s)."
+          + (f" {ignorados} ignorado(s): já matriculados ou não são alunos." if ignorados else ""),
+          "success" if criadas else "info")
+    return redirect(url_for('disciplina_alunos', disciplina_id=disciplina_id))
+
+@app.route("/admin/disciplinas/<int:disciplina_id>/desmatricular", methods=["POST"])
+@login_required(['admin'])
+def desmatricular_alunos(disciplina_id):
+    """Remove as matrículas dos alunos marcados (apenas admin)"""
+    ids = [int(i) for i in request.form.getlist("aluno_id") if i.isdigit()]
+    removidas = enrollments.unenroll(get_db(), disciplina_id, ids) if ids else 0
+    flash(f"{removidas} matrícula(s) removida(s).", "success" if removidas else "info")
+    return redirect(url_for('disciplina_alunos', disciplina_id=disciplina_id))
+
 # Gerenciamento de Notícias
 @app.route("/admin/noticias")
 @login_required(['admin', 'professor'])
 def admin_noticias():
     """Gerenciamento de notícias"""
     conn = get_db()
-    noticias = conn.execute('''
-        SELECT n.*, u.nome as autor_nome 
-        FROM noticias n 
-        LEFT JOIN users u ON n.autor_id = u.id 
-        ORDER BY n.data_publicacao DESC
-    ''').fetchall()
-    conn.close()
+    pagina = keyset_page(conn, **LISTA_NOTICIAS)
     
-    return render_template("admin/noticias_admin.html", noticias=noticias)
+    return render_template("admin/noticias_admin.html", noticias=pagina['itens'], pagina=pagina)
 
 @app.route("/admin/noticias/cadastrar", methods=["GET", "POST"])
 @login_required(['admin', 'professor'])
@@ -405,50 +989,313 @@ def cadastrar_noticia():
         titulo = request.form.get("titulo", "").strip()
         conteudo = request.form.get("conteudo", "").strip()
         destaque = request.form.get("destaque", "off") == "on"
+        arquivo = request.files.get("imagem")
+        
+        imagem = None
+        if arquivo and arquivo.filename:
+            try:
+                imagem = images.save(arquivo)
+            except ValueError as e:
+                flash(str(e), "error")
+                return render_template("admin/cadastrar_noticia.html")
         
         if not titulo or not conteudo:
             flash("Preencha todos os campos obrigatórios.", "error")
         else:
             conn = get_db()
             try:
-                conn.execute('''
-                    INSERT INTO noticias (titulo, conteudo, autor_id, destaque)
-                    VALUES (?, ?, ?, ?)
-                ''', (titulo, conteudo, session['user_id'], destaque))
-                conn.commit()
-                conn.close()
+                with db_manager.transaction(conn):
+                    conn.execute('''
+                        INSERT INTO noticias (titulo, conteudo, autor_id, destaque, imagem)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (titulo, conteudo, session['user_id'], destaque, imagem))
+                stats.invalidate()
+                page_cache.invalidate('stats', 'news')
                 flash("Notícia publicada com sucesso!", "success")
                 return redirect(url_for('admin_noticias'))
             except Exception as e:
                 flash(f"Erro ao publicar notícia: {str(e)}", "error")
-                conn.close()
     
     return render_template("admin/cadastrar_noticia.html")
 
+# Exportação de dados
+@app.route("/admin/exportar/<tabela>.<formato>")
+@login_required(['admin'])
+def exportar(tabela, formato):
+    """Exporta uma tabela em CSV ou NDJSON, em streaming (?colunas=a,b&gzip=1)"""
+    if formato not in exporter.FORMATOS:
+        abort(404)
+    selecao = [c.strip() for c in request.args.get('colunas', '').split(',') if c.strip()]
+    try:
+        colunas = exporter.resolve_columns(tabela, selecao)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    compress = request.args.get('gzip') == '1'
+    nome = f"{tabela}.{formato}" + ('.gz' if compress else '')
+    response = app.response_class(
+        exporter.export(db_manager, tabela, colunas, formato, compress, app.config['EXPORT_BATCH_SIZE']),
+        mimetype='application/gzip' if compress else exporter.FORMATOS[formato],
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{nome}"'
+    return response
+
 # API para estatísticas (opcional)
 @app.route("/api/estatisticas")
 @login_required(['admin', 'professor'])
 def api_estatisticas():
     """API para obter estatísticas"""
-    conn = get_db()
+    estatisticas = stats.get(get_db())
     
-    total_alunos = conn.execute("SELECT COUNT(*) FROM users WHERE tipo = 'aluno' AND ativo = 1").fetchone()[0]
-    total_professores = conn.execute("SELECT COUNT(*) FROM users WHERE tipo = 'professor' AND ativo = 1").fetchone()[0]
-    total_disciplinas = conn.execute("SELECT COUNT(*) FROM disciplinas").fetchone()[0]
+    return jsonify({
+        'alunos': estatisticas['aluno'],
+        'professores': estatisticas['professor'],
+        'disciplinas': estatisticas['disciplinas']
+    })
+
+@app.route("/api/page-cache")
+@login_required(['admin'])
+def api_page_cache():
+    """Taxa de acerto e memória ocupada pelo cache de páginas"""
+    return jsonify(page_cache.stats())
+
+@app.route("/api/db-pool")
+@login_required(['admin'])
+def api_db_pool():
+    """Contadores do pool de conexões (para dimensionar DB_POOL_SIZE)"""
+    return jsonify(db_manager.pool_stats())
+
+@app.route("/admin/consultas-lentas", methods=['GET', 'POST'])
+@login_required(['admin'])
+def admin_consultas_lentas():
+    """Consultas acima do limite, agrupadas pelo SQL normalizado, com o plano de execução"""
+    if request.method == 'POST':
+        slow_queries.clear()
+        flash("Registro de consultas lentas limpo.", "success")
+        return redirect(url_for('admin_consultas_lentas'))
     
+    ordem = request.args.get('ordem', 'total')
+    if ordem not in ('total', 'max', 'count', 'visto_em'):
+        ordem = 'total'
+    return render_template("admin/consultas_lentas.html", consultas=slow_queries.entries(ordem),
+                           ordem=ordem, limite=slow_queries.threshold)
+
+@app.route("/metrics")
+@login_required(['admin'])
+def metrics_endpoint():
+    """Latência por rota (histograma e p50/p95/p99), SQL e templates no formato do Prometheus"""
+    gauges = {
+        'app_db_pool': db_manager.pool_stats(),
+        'app_page_cache': page_cache.stats(),
+        'app_user_cache': users.stats(),
+        'app_template_load_seconds': {nome: round(s, 6) for nome, s in template_compile_times.items()},
+    }
+    if limiter is not None:
+        gauges['app_rate_limit'] = limiter.stats()
+    return app.response_class(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+# Consultas das rotas verificadas por "flask check-query-plans": as mesmas constantes e
+# construtores que as rotas executam, com parâmetros de exemplo (páginas após um cursor)
+ROUTE_QUERIES = {
+    'index/destaques': (FEED_DESTAQUES_QUERY, (3,)),
+    'noticias/validadores': (NOTICIAS_VALIDADORES_QUERY, ()),
+    'noticias': (keyset_query(**LISTA_NOTICIAS, cursor=True), ('2024-01-01 00:00:00', 10, 21)),
+    'noticia_detalhe/versao': (NOTICIA_VERSAO_QUERY, (1,)),
+    'noticia_detalhe': (NOTICIA_DETALHE_QUERY, (1,)),
+    'noticias/busca': (BUSCA_QUERY, (_HL_INICIO, _HL_FIM, _HL_INICIO, _HL_FIM, '"matematica"*', 11, 0)),
+    'login': (LOGIN_QUERY, ('admin',)),
+    'area_aluno': (AREA_ALUNO_QUERY, (4,)),
+    'area_aluno/noticias': (FEED_RECENTES_QUERY, (5,)),
+    'admin_dashboard': (ADMIN_DASHBOARD_QUERY, (5, 5)),
+    'admin_alunos': (keyset_query(**LISTA_ALUNOS, cursor=True), ('Ana', 4, 21)),
+    'admin_professores': (TEACHING_LOADS_QUERY, ()),
+    'admin_disciplinas': (keyset_query(**LISTA_DISCIPLINAS, cursor=True), ('Matemática', 1, 21)),
+    'disciplina_alunos/disciplina': (DISCIPLINA_QUERY, (1,)),
+    'disciplina_alunos': (keyset_query(**LISTA_ROSTER, cursor=True), (1, 4, 21)),
+    'matriculas/contagens': (COUNTS_QUERY.format('?, ?, ?'), (1, 2, 3)),
+}
+
+@app.cli.command("check-query-plans")
+def check_query_plans():
+    """Falha se alguma consulta das rotas fizer varredura completa de tabela"""
+    db_manager.init_db()
+    conn = db_manager.connect()
+    falhas = 0
+    for nome, (query, params) in ROUTE_QUERIES.items():
+        plano = db_manager.explain(conn, query, params)
+        # "SCAN (subquery-N)" percorre o resultado de uma subconsulta e "SCAN CONSTANT ROW"
+        # é um SELECT sem FROM: nenhum dos dois lê uma tabela
+        scans = [p for p in plano if p.startswith('SCAN') and 'INDEX' not in p
+                 and not p.startswith(('SCAN (subquery', 'SCAN CONSTANT ROW'))]
+        falhas += bool(scans)
+        print(f"{'FALHA' if scans else 'ok':5} {nome}: {' | '.join(plano)}")
     conn.close()
+    if falhas:
+        raise SystemExit(f"{falhas} consulta(s) com varredura completa de tabela")
+
+# Orçamento de consultas SQL por página, verificado por "flask check-query-counts".
+# {endpoint: (tipo de usuário logado ou None, limite)}
+QUERY_BUDGETS = {
+    'index': (None, 2),
+    'noticias': (None, 2),
+    'admin_dashboard': ('admin', 2),
+    'area_aluno': ('aluno', 2),
+    'admin_alunos': ('admin', 1),
+    'admin_disciplinas': ('admin', 2),
+    'admin_professores': ('admin', 1),
+}
+
+def _consultas_da_pagina(sql_):
+    """Controle de transação e leitura/gravação da sessão não contam no orçamento"""
+    comando = sql_.lstrip().upper()
+    return not comando.startswith(('BEGIN', 'COMMIT', 'ROLLBACK')) and 'SESSOES' not in comando
+
+def _pedir(client, url):
+    """GET num app context próprio: o da CLI não pode emprestar `g` (usuário, conexão) à página"""
+    with app.app_context():
+        resposta = client.get(url)
+        return resposta, g.get('query_log')
+
+@app.cli.command("check-query-counts")
+def check_query_counts():
+    """Falha se alguma página executar mais consultas SQL do que o orçamento.
     
-    return jsonify({
-        'alunos': total_alunos,
-        'professores': total_professores,
-        'disciplinas': total_disciplinas
-    })
+    Cada página é pedida pelo test client, passando pela sessão, pelo
+    login_required e pela rota de verdade; conta o QueryLog da requisição.
+    """
+    db_manager.init_db()
+    app.config.update(METRICS_ENABLED=True, PAGE_CACHE_ENABLED=False)
+    conn = db_manager.connect()
+    falhas = 0
+    for endpoint, (tipo, limite) in QUERY_BUDGETS.items():
+        client = app.test_client()
+        if tipo is not None:
+            usuario = conn.execute(
+                "SELECT id FROM users WHERE tipo = ? AND ativo = 1 LIMIT 1", (tipo,)
+            ).fetchone()
+            if usuario is None:
+                print(f"{'pulo':5} {endpoint}: nenhum usuário do tipo {tipo}")
+                continue
+            with app.app_context(), client.session_transaction() as sessao:
+                sessao['user_id'] = usuario['id']
+        with app.test_request_context():
+            url = url_for(endpoint)
+        # Usuário já no cache, como nas páginas seguintes da sessão
+        _pedir(client, url)
+        # Contadores frios: a consulta das estatísticas entra na conta
+        stats.invalidate()
+        resposta, log = _pedir(client, url)
+        total = sum(1 for sql_, _, _ in log.entries if _consultas_da_pagina(sql_))
+        if resposta.status_code != 200:
+            falhas += 1
+            print(f"{'FALHA':5} {endpoint}: HTTP {resposta.status_code}")
+            continue
+        falhas += total > limite
+        print(f"{'FALHA' if total > limite else 'ok':5} {endpoint}: {total} consulta(s) (limite {limite})")
+    conn.close()
+    if falhas:
+        raise SystemExit(f"{falhas} página(s) acima do orçamento de consultas")
+
+@app.cli.command("import-alunos")
+@click.argument("arquivo", type=click.Path(exists=True, dir_okay=False))
+@click.option("--formato", type=click.Choice(['csv', 'jsonl']), default=None,
+              help="Padrão: deduzido pela extensão do arquivo")
+def import_alunos(arquivo, formato):
+    """Importa alunos em lote de um arquivo CSV ou JSONL"""
+    db_manager.init_db()
+    if formato is None:
+        formato = 'jsonl' if arquivo.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+    with open(arquivo, encoding='utf-8-sig', newline='') as f:
+        relatorio = _student_importer().import_stream(f, formato)
+    for linha, erro in relatorio['erros']:
+        print(f"linha {linha}: {erro}")
+    print(f"{relatorio['importados']}/{relatorio['linhas']} aluno(s) importado(s), "
+          f"{relatorio['matriculas']} matrícula(s), {relatorio['total_erros']} erro(s) "
+          f"em {relatorio['segundos']}s ({relatorio['linhas_por_segundo']} linhas/s; "
+          f"{relatorio['senhas']} senha(s) em {relatorio['segundos_senhas']}s)")
+
+@app.cli.command("export")
+@click.argument("tabela", type=click.Choice(sorted(exporter.EXPORTS)))
+@click.option("--formato", type=click.Choice(sorted(exporter.FORMATOS)), default='csv')
+@click.option("--colunas", default='', help="Lista separada por vírgulas (padrão: todas)")
+@click.option("--gzip", "compress", is_flag=True, help="Comprime a saída com gzip")
+@click.option("-o", "--saida", type=click.File('wb'), default='-', help="Arquivo de saída (padrão: stdout)")
+def export_command(tabela, formato, colunas, compress, saida):
+    """Exporta alunos, professores, disciplinas ou matrículas em streaming"""
+    selecao = [c.strip() for c in colunas.split(',') if c.strip()]
+    try:
+        colunas = exporter.resolve_columns(tabela, selecao)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--colunas')
+    for bloco in exporter.export(db_manager, tabela, colunas, formato, compress, app.config['EXPORT_BATCH_SIZE']):
+        saida.write(bloco)
+
+@app.cli.command("build-assets")
+def build_assets():
+    """Gera os arquivos estáticos versionados e pré-comprimidos"""
+    for nome, versionado in asset_pipeline.build().items():
+        print(f"{nome} -> {versionado}")
+
+@app.cli.command("compile-templates")
+@click.option("--cold", is_flag=True, help="Descarta o bytecode em cache e mede a compilação do zero")
+def compile_templates(cold):
+    """Pré-compila todos os templates (grava o cache de bytecode) e mostra o tempo de cada um"""
+    if cold and app.jinja_env.bytecode_cache is not None:
+        app.jinja_env.bytecode_cache.clear()
+    tempos = precompile_templates()
+    for nome, segundos in sorted(tempos.items(), key=lambda t: t[1], reverse=True):
+        print(f"{segundos * 1000:8.2f} ms  {nome}")
+    print(f"{sum(tempos.values()) * 1000:8.2f} ms  total ({len(tempos)} templates)")
+
+@app.cli.command("check-stats")
+@click.option("--repair", is_flag=True, help="Corrige os contadores divergentes")
+def check_stats(repair):
+    """Recalcula as estatísticas do zero e aponta divergências nos contadores"""
+    db_manager.init_db()
+    conn = db_manager.connect()
+    divergencias = stats.check(conn)
+    for chave, (contador, real) in divergencias.items():
+        print(f"DIVERGENTE {chave}: contador={contador} real={real}")
+    if divergencias and repair:
+        with db_manager.transaction(conn):
+            stats.repair(conn, divergencias)
+        print("Contadores corrigidos.")
+    conn.close()
+    if not divergencias:
+        print("Contadores consistentes.")
+    elif not repair:
+        raise SystemExit(1)
+
+@app.cli.command("check-enrollments")
+@click.option("--repair", is_flag=True, help="Remove as matrículas órfãs listadas")
+def check_enrollments(repair):
+    """Lista matrículas de alunos que não existem mais (nada é apagado sem --repair)"""
+    db_manager.init_db()
+    conn = db_manager.connect()
+    orfas = enrollments.orphans(conn)
+    for matricula in orfas:
+        print(f"ORFÃ matrícula {matricula['id']}: aluno {matricula['aluno_id']} "
+              f"na disciplina {matricula['disciplina_id']}")
+    if orfas and repair:
+        removidas = enrollments.delete_orphans(conn, [m['id'] for m in orfas])
+        print(f"{removidas} matrícula(s) órfã(s) removida(s).")
+    conn.close()
+    if not orfas:
+        print("Nenhuma matrícula órfã.")
+    elif not repair:
+        raise SystemExit(1)
 
 # Handlers de erro
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template('errors/404.html'), 404
 
+@app.errorhandler(413)
+def request_too_large(e):
+    limite = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    flash(f"Arquivo maior que o limite de {limite}MB.", "error")
+    return redirect(request.url)
+
 @app.errorhandler(500)
 def internal_server_error(e):
     return render_template('errors/500.html'), 500
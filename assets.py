@@ -0,0 +1,76 @@
+"""Pipeline de arquivos estáticos: nomes com hash, versões pré-comprimidas e manifesto"""
+import gzip
+import hashlib
+import json
+import os
+
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele, só gerimos .gz
+    brotli = None
+
+ASSETS = ['css/style.css', 'css/admin.css', 'js/script.js']
+
+# Codificações pré-geradas, na ordem de preferência
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+class AssetPipeline:
+    """Gera `dist/` com cópias versionadas pelo conteúdo e o manifesto lógico -> versionado"""
+
+    def __init__(self, static_folder, assets=ASSETS, output='dist'):
+        self.static_folder = static_folder
+        self.assets = list(assets)
+        self.output_dir = os.path.join(static_folder, output)
+        self.manifest = {}
+
+    def build(self):
+        """Gera os arquivos que ainda não existem e regrava o manifesto"""
+        manifest = {}
+        for nome in self.assets:
+            origem = os.path.join(self.static_folder, nome)
+            if not os.path.exists(origem):
+                continue
+            with open(origem, 'rb') as f:
+                conteudo = f.read()
+
+            base, ext = os.path.splitext(nome)
+            digest = hashlib.sha256(conteudo).hexdigest()[:12]
+            versionado = f"{base}.{digest}{ext}"
+            self._write(versionado, conteudo)
+            self._write(versionado + '.gz', lambda: gzip.compress(conteudo, compresslevel=9, mtime=0))
+            if brotli is not None:
+                self._write(versionado + '.br', lambda: brotli.compress(conteudo))
+            manifest[nome] = versionado
+
+        self._write('manifest.json', json.dumps(manifest, indent=2, sort_keys=True).encode(), replace=True)
+        self.manifest = manifest
+        return manifest
+
+    def resolve(self, nome):
+        """Nome versionado do arquivo, ou None se ele não passou pelo pipeline"""
+        return self.manifest.get(nome)
+
+    def choose(self, versionado, accept_encodings):
+        """Escolhe o arquivo pré-comprimido aceito pelo cliente: (caminho, Content-Encoding)"""
+        caminho = safe_join(self.output_dir, versionado)
+        if caminho is None or not os.path.isfile(caminho):
+            return None, None
+        for encoding, sufixo in ENCODINGS:
+            if accept_encodings[encoding] and os.path.exists(caminho + sufixo):
+                return caminho + sufixo, encoding
+        return caminho, None
+
+    def _write(self, nome, conteudo, replace=False):
+        destino = os.path.join(self.output_dir, nome)
+        if os.path.exists(destino) and not replace:
+            return
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        if callable(conteudo):
+            conteudo = conteudo()
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        with open(temporario, 'wb') as f:
+            f.write(conteudo)
+        os.replace(temporario, destino)
@@ -0,0 +1,13 @@
+"""Benchmarks de desempenho da Escola Colaço (executar com python -m benchmarks.<nome>)"""
+import os
+import tempfile
+
+
+def use_temp_database(db_manager):
+    """Aponta o Database para um arquivo temporário, para não tocar no banco real.
+    
+    Deve ser chamado antes de qualquer conexão ser aberta pelo pool.
+    """
+    db_manager.db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    db_manager.init_db()
+    return db_manager.db_path
@@ -0,0 +1,67 @@
+"""Bytes trafegados e custo de CPU do CompressionMiddleware por nível de compressão
+
+Uso: python -m benchmarks.bench_compression [--requests 300] [--noticias 100]
+"""
+import argparse
+import json
+import time
+
+from werkzeug.test import Client
+
+from app import app, db_manager, page_cache
+from benchmarks import use_temp_database
+from compression import CompressionMiddleware
+
+
+def _seed(total):
+    conn = db_manager.connect()
+    with db_manager.transaction(conn):
+        conn.executemany(
+            "INSERT INTO noticias (titulo, conteudo, autor_id) VALUES (?, ?, 1)",
+            [(f'Notícia {i}', 'Conteúdo da notícia de teste. ' * 40) for i in range(total)],
+        )
+    conn.close()
+
+
+def _measure(wsgi_app, url, total, encoding):
+    client = Client(wsgi_app)
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    tamanho = len(client.get(url, headers=headers).get_data())
+    inicio = time.process_time()
+    for _ in range(total):
+        client.get(url, headers=headers).get_data()
+    return tamanho, (time.process_time() - inicio) / total * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--noticias', type=int, default=100)
+    args = parser.parse_args()
+
+    use_temp_database(db_manager)
+    _seed(args.noticias)
+    app.config['PAGE_CACHE_ENABLED'] = False
+    page_cache.clear()
+
+    # app.wsgi_app já está embrulhado; medimos a aplicação Flask interna
+    interna = app.wsgi_app.app
+    url = f"/noticias?por_pagina={min(args.noticias, app.config['MAX_PAGE_SIZE'])}"
+    base_bytes, base_ms = _measure(interna, url, args.requests, None)
+
+    results = [{'level': None, 'bytes': base_bytes, 'cpu_ms_per_request': round(base_ms, 3)}]
+    for level in (1, 3, 6, 9):
+        middleware = CompressionMiddleware(interna, min_size=app.config['COMPRESS_MIN_SIZE'], level=level)
+        tamanho, ms = _measure(middleware, url, args.requests, 'gzip')
+        results.append({
+            'level': level,
+            'bytes': tamanho,
+            'ratio': round(tamanho / base_bytes, 4),
+            'cpu_ms_per_request': round(ms, 3),
+            'compression_cpu_ms': round(ms - base_ms, 3),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
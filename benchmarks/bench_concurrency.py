@@ -0,0 +1,105 @@
+"""Leituras e escritas concorrentes no SQLite: perfil padrão x perfil WAL
+
+Uso: python -m benchmarks.bench_concurrency [--seconds 5] [--readers 8] [--writers 2]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from models import Database
+
+
+def _prepare(db):
+    db.init_db()
+    conn = db.connect()
+    for i in range(2000):
+        conn.execute(
+            "INSERT INTO users (nome, username, password, tipo) VALUES (?, ?, 'x', 'aluno')",
+            (f'Aluno {i}', f'aluno{i}'),
+        )
+    conn.commit()
+    conn.close()
+
+
+def _run(profile, seconds, readers, writers):
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'bench.db')
+    tuned = profile == 'wal'
+    db = Database(path, pool_size=readers + writers, pragmas=None if tuned else {})
+    _prepare(db)
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def reader():
+        conn = db.get_connection()
+        n = 0
+        while time.monotonic() < stop:
+            conn.execute("SELECT COUNT(*) FROM users WHERE tipo = 'aluno' AND ativo = 1").fetchone()
+            conn.execute("SELECT * FROM noticias ORDER BY data_publicacao DESC LIMIT 5").fetchall()
+            n += 1
+        db.release_connection(conn)
+        with lock:
+            counts['reads'] += n
+
+    def writer(w):
+        conn = db.get_connection()
+        n = errors = 0
+        while time.monotonic() < stop:
+            try:
+                if tuned:
+                    with db.transaction(conn):
+                        conn.execute(
+                            "INSERT INTO noticias (titulo, conteudo, autor_id) VALUES (?, ?, 1)",
+                            (f'Notícia {w}-{n}', 'Conteúdo de teste'),
+                        )
+                else:
+                    conn.execute(
+                        "INSERT INTO noticias (titulo, conteudo, autor_id) VALUES (?, ?, 1)",
+                        (f'Notícia {w}-{n}', 'Conteúdo de teste'),
+                    )
+                    conn.commit()
+                n += 1
+            except sqlite3.OperationalError:
+                errors += 1
+                conn.rollback()
+        db.release_connection(conn)
+        with lock:
+            counts['writes'] += n
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    db.pool.close_all()
+
+    return {
+        'profile': profile,
+        'reads_per_sec': round(counts['reads'] / seconds, 1),
+        'writes_per_sec': round(counts['writes'] / seconds, 1),
+        'lock_errors': counts['errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+
+    results = [_run(profile, args.seconds, args.readers, args.writers)
+               for profile in ('default', 'wal')]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
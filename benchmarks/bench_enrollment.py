@@ -0,0 +1,66 @@
+"""Matrículas em lote: 10 mil alunos numa disciplina, lista paginada, contagens e carga horária
+
+Uso: python -m benchmarks.bench_enrollment [--students 10000] [--disciplines 50] [--batch-size 500] [--budget 1.0]
+"""
+import argparse
+import json
+import time
+
+from benchmarks import use_temp_database
+from benchmarks.datagen import generate
+from app import LISTA_ROSTER, keyset_query
+from enrollment import EnrollmentService
+from models import Database
+
+
+def _tempo(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, round(time.perf_counter() - inicio, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=10_000)
+    parser.add_argument('--disciplines', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--budget', type=float, default=1.0, help="Segundos permitidos para matricular todos")
+    args = parser.parse_args()
+
+    db = Database()
+    use_temp_database(db)
+    generate(db, alunos=args.students, professores=10, disciplinas=args.disciplines, noticias=0,
+             matriculas_por_aluno=0, password_hash='!')
+    servico = EnrollmentService(db, batch_size=args.batch_size)
+
+    conn = db.connect()
+    try:
+        disciplina_id = conn.execute("SELECT MIN(id) FROM disciplinas").fetchone()[0]
+        aluno_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE tipo = 'aluno'")]
+        disciplina_ids = [r[0] for r in conn.execute("SELECT id FROM disciplinas")]
+
+        criadas, enroll_s = _tempo(servico.enroll, conn, disciplina_id, aluno_ids)
+        repetidas, reenroll_s = _tempo(servico.enroll, conn, disciplina_id, aluno_ids)
+        _, roster_s = _tempo(lambda: conn.execute(keyset_query(**LISTA_ROSTER), (disciplina_id, 21)).fetchall())
+        _, counts_s = _tempo(servico.counts, conn, disciplina_ids[:20])
+        cargas, loads_s = _tempo(servico.teaching_loads, conn)
+        removidas, unenroll_s = _tempo(servico.unenroll, conn, disciplina_id, aluno_ids)
+    finally:
+        conn.close()
+
+    print(json.dumps({
+        'students': len(aluno_ids),
+        'batch_size': args.batch_size,
+        'enroll': {'created': criadas, 'seconds': enroll_s, 'within_budget': enroll_s <= args.budget},
+        'reenroll_ignored': {'created': repetidas, 'seconds': reenroll_s},
+        'roster_first_page_seconds': roster_s,
+        'counts_20_disciplines_seconds': counts_s,
+        'teaching_loads': {'professors': len(cargas), 'seconds': loads_s},
+        'unenroll': {'removed': removidas, 'seconds': unenroll_s},
+    }, indent=2))
+    if enroll_s > args.budget:
+        raise SystemExit(f"Matrícula de {len(aluno_ids)} alunos levou {enroll_s}s (limite {args.budget}s)")
+
+
+if __name__ == '__main__':
+    main()
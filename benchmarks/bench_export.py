@@ -0,0 +1,65 @@
+"""Memória e vazão da exportação em streaming conforme o número de linhas cresce
+
+Uso: python -m benchmarks.bench_export [--rows 1000000]
+
+O pico de memória (tracemalloc) deve ficar praticamente constante entre os
+tamanhos; se crescer com o número de linhas, algo passou a acumular o resultado.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import exporter
+from app import app, db_manager
+from benchmarks import use_temp_database
+
+
+def _fill(total):
+    conn = db_manager.connect()
+    with db_manager.transaction(conn):
+        conn.execute("DELETE FROM matriculas")
+        conn.execute('''
+            WITH RECURSIVE seq(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < ?)
+            INSERT INTO matriculas (aluno_id, disciplina_id) SELECT i, i FROM seq
+        ''', (total,))
+    conn.close()
+
+
+def _export(formato, compress):
+    colunas = exporter.resolve_columns('matriculas')
+    total_bytes = 0
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    for bloco in exporter.export(db_manager, 'matriculas', colunas, formato, compress,
+                                 app.config['EXPORT_BATCH_SIZE']):
+        total_bytes += len(bloco)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total_bytes, pico, segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    use_temp_database(db_manager)
+    results = []
+    for total in sorted({args.rows // 100, args.rows // 10, args.rows}):
+        _fill(total)
+        for formato, compress in (('csv', False), ('ndjson', False), ('csv', True)):
+            total_bytes, pico, segundos = _export(formato, compress)
+            results.append({
+                'rows': total,
+                'format': formato + ('.gz' if compress else ''),
+                'bytes': total_bytes,
+                'peak_memory_kb': round(pico / 1024, 1),
+                'rows_per_sec': round(total / segundos, 1),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
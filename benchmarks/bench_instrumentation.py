@@ -0,0 +1,61 @@
+"""Custo da instrumentação (tempo de SQL, templates e Server-Timing) por instrução e por requisição
+
+Uso: python -m benchmarks.bench_instrumentation [--queries 50000] [--requests 1000]
+"""
+import argparse
+import json
+import time
+
+from app import app, db_manager
+from benchmarks import use_temp_database
+from metrics import QueryLog
+
+URLS = ['/', '/noticias', '/noticia/1']
+
+
+def _queries(total, log):
+    conn = db_manager.get_connection()
+    conn.query_log = log
+    try:
+        inicio = time.perf_counter()
+        for i in range(total):
+            conn.execute("SELECT id, nome FROM users WHERE id = ?", (i % 5 + 1,)).fetchone()
+        return (time.perf_counter() - inicio) / total * 1e6
+    finally:
+        conn.query_log = None
+        db_manager.release_connection(conn)
+
+
+def _requests(enabled, total):
+    app.config['METRICS_ENABLED'] = enabled
+    client = app.test_client()
+    resultados = {}
+    for url in URLS:
+        client.get(url)
+        inicio = time.perf_counter()
+        for _ in range(total):
+            client.get(url)
+        resultados[url] = round(total / (time.perf_counter() - inicio), 1)
+    return {'metrics': enabled, 'requests_per_sec': resultados}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    use_temp_database(db_manager)
+    app.config['PAGE_CACHE_ENABLED'] = False
+    sem = _queries(args.queries, None)
+    com = _queries(args.queries, QueryLog())
+    results = [
+        {'us_per_query': {'off': round(sem, 2), 'on': round(com, 2), 'overhead_us': round(com - sem, 2)}},
+        _requests(False, args.requests),
+        _requests(True, args.requests),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
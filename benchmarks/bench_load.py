@@ -0,0 +1,209 @@
+"""Carga concorrente nas rotas principais com dados sintéticos; resultado em JSON
+
+Uso: python -m benchmarks.bench_load [--size 10k] [--db bench.db] [--threads 8] [--seconds 10]
+                                     [--no-page-cache] [--no-rate-limit] [--output resultados.jsonl]
+
+Cada cliente simulado tem o seu IP (REMOTE_ADDR), como alunos em aparelhos diferentes;
+respostas 429 do limite de tentativas saem em `rate_limited`, fora dos erros e das latências.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+import app as modulo_app
+from app import app, db_manager, hasher, page_cache
+from benchmarks import datagen, use_temp_database
+
+# (peso, cenário): cada cenário faz uma ou mais requisições com o test client da thread
+SCENARIOS = [
+    (30, 'index'),
+    (25, 'noticias'),
+    (25, 'noticia'),
+    (5, 'login'),
+    (10, 'area_aluno'),
+    (5, 'admin'),
+]
+
+
+def percentile(valores, q):
+    """Percentil por interpolação linear numa lista já ordenada"""
+    if not valores:
+        return 0.0
+    pos = (len(valores) - 1) * q
+    i = int(pos)
+    j = min(i + 1, len(valores) - 1)
+    return valores[i] + (valores[j] - valores[i]) * (pos - i)
+
+
+def _client(ip):
+    client = app.test_client()
+    client.environ_base['REMOTE_ADDR'] = ip
+    return client
+
+
+class Worker:
+    def __init__(self, numero, rng, noticia_ids, alunos):
+        self.rng = rng
+        self.noticia_ids = noticia_ids
+        self.alunos = alunos
+        ip = f'10.0.{numero // 250}.{numero % 250 + 1}'
+        self.anonimo = _client(ip)
+        self.aluno = _client(ip)
+        self.admin = _client(ip)
+        self.latencias = {}
+        self.erros = {}
+        self.limitadas = {}
+
+    def _get(self, nome, client, url, **kwargs):
+        inicio = time.perf_counter()
+        if 'data' in kwargs:
+            r = client.post(url, **kwargs)
+        else:
+            r = client.get(url, **kwargs)
+        if r.status_code == 429:
+            self.limitadas[nome] = self.limitadas.get(nome, 0) + 1
+            return r
+        self.latencias.setdefault(nome, []).append(time.perf_counter() - inicio)
+        if r.status_code >= 400 or r.status_code == 302 and 'login' in (r.location or ''):
+            self.erros[nome] = self.erros.get(nome, 0) + 1
+        return r
+
+    def _login(self, client, username, password, nome='login'):
+        return self._get(nome, client, '/login', data={'username': username, 'password': password})
+
+    def setup(self):
+        self._login(self.aluno, self.rng.choice(self.alunos), datagen.BENCH_PASSWORD, nome='setup')
+        self._login(self.admin, 'admin', 'admin123', nome='setup')
+        self.latencias.pop('setup', None)
+
+    def run(self, cenario):
+        if cenario == 'index':
+            self._get('/', self.anonimo, '/')
+        elif cenario == 'noticias':
+            self._get('/noticias', self.anonimo, '/noticias')
+        elif cenario == 'noticia':
+            self._get('/noticia/<id>', self.anonimo, f'/noticia/{self.rng.choice(self.noticia_ids)}')
+        elif cenario == 'login':
+            # Um aparelho novo a cada login: o limite por IP não junta a carga toda num endereço
+            client = _client(f'10.{self.rng.randint(1, 254)}.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}')
+            self._login(client, self.rng.choice(self.alunos), datagen.BENCH_PASSWORD)
+        elif cenario == 'area_aluno':
+            self._get('/area-aluno', self.aluno, '/area-aluno')
+        elif cenario == 'admin':
+            self._get('/admin', self.admin, '/admin')
+
+
+def _load_ids(conn):
+    noticia_ids = [r[0] for r in conn.execute("SELECT id FROM noticias")]
+    alunos = [r[0] for r in conn.execute("SELECT username FROM users WHERE username LIKE 'bench.aluno%'")]
+    return noticia_ids, alunos
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=sorted(datagen.SIZES), default='10k')
+    parser.add_argument('--db', help="Banco já gerado por benchmarks.datagen (padrão: gera um temporário)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--no-page-cache', action='store_true')
+    parser.add_argument('--no-rate-limit', action='store_true', help="Desliga o limite de tentativas no login")
+    parser.add_argument('--output', help="Acrescenta o resultado (uma linha JSON) a este arquivo")
+    args = parser.parse_args()
+
+    if args.db:
+        db_manager.db_path = args.db
+        db_manager.init_db()
+    else:
+        use_temp_database(db_manager)
+        datagen.generate(db_manager, seed=args.seed, password_hash=hasher.hash(datagen.BENCH_PASSWORD),
+                         **datagen.SIZES[args.size])
+    app.config['PAGE_CACHE_ENABLED'] = not args.no_page_cache
+    page_cache.clear()
+
+    conn = db_manager.connect()
+    noticia_ids, alunos = _load_ids(conn)
+    conn.close()
+    if not alunos:
+        raise SystemExit("O banco não tem usuários bench.aluno*; gere-o com python -m benchmarks.datagen")
+
+    pesos = [p for p, _ in SCENARIOS]
+    cenarios = [c for _, c in SCENARIOS]
+    workers = [Worker(i, random.Random(args.seed + i), noticia_ids, alunos) for i in range(args.threads)]
+    # Os logins de preparação não são carga medida: 'admin' entra uma vez por thread
+    limiter, modulo_app.limiter = modulo_app.limiter, None
+    for w in workers:
+        w.setup()
+    modulo_app.limiter = None if args.no_rate_limit else limiter
+
+    barreira = threading.Barrier(args.threads + 1)
+    fim = [0.0]
+
+    def executar(w):
+        barreira.wait()
+        while time.perf_counter() < fim[0]:
+            w.run(w.rng.choices(cenarios, pesos)[0])
+
+    threads = [threading.Thread(target=executar, args=(w,)) for w in workers]
+    for t in threads:
+        t.start()
+    fim[0] = time.perf_counter() + args.seconds
+    inicio = time.perf_counter()
+    barreira.wait()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    rotas = {}
+    for w in workers:
+        for nome, valores in w.latencias.items():
+            rotas.setdefault(nome, []).extend(valores)
+    resultado = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'size': None if args.db else args.size,
+        'db': args.db,
+        'threads': args.threads,
+        'seconds': round(duracao, 2),
+        'page_cache': not args.no_page_cache,
+        'rate_limit': modulo_app.limiter is not None,
+        'requests': sum(len(v) for v in rotas.values()),
+        'requests_per_sec': round(sum(len(v) for v in rotas.values()) / duracao, 1),
+        'errors': sum(sum(w.erros.values()) for w in workers),
+        'rate_limited': sum(sum(w.limitadas.values()) for w in workers),
+        'routes': {},
+    }
+    for w in workers:
+        for nome in w.limitadas:
+            rotas.setdefault(nome, [])
+    for nome, valores in sorted(rotas.items()):
+        valores.sort()
+        resultado['routes'][nome] = {
+            'requests': len(valores),
+            'requests_per_sec': round(len(valores) / duracao, 1),
+            'errors': sum(w.erros.get(nome, 0) for w in workers),
+            'rate_limited': sum(w.limitadas.get(nome, 0) for w in workers),
+            **{f'p{int(q * 100)}_ms': round(percentile(valores, q) * 1000, 2) for q in (0.5, 0.95, 0.99)},
+        }
+
+    print(json.dumps(resultado, indent=2))
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(resultado) + '\n')
+
+
+if __name__ == '__main__':
+    main()
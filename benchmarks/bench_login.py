@@ -0,0 +1,62 @@
+"""Vazão de login (verificações de senha por segundo) em vários custos de hash
+
+Uso: python -m benchmarks.bench_login [--seconds 3] [--clients 16] [--workers 2]
+"""
+import argparse
+import json
+import threading
+import time
+
+from passwords import PasswordHasher
+
+METHODS = [
+    'pbkdf2:sha256:100000',
+    'pbkdf2:sha256:600000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+]
+
+
+def _run(method, seconds, clients, workers):
+    hasher = PasswordHasher(method=method, workers=workers, max_pending=clients)
+    stored = hasher.hash('aluno123')
+    latencias = []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def cliente():
+        medidas = []
+        while time.monotonic() < stop:
+            inicio = time.perf_counter()
+            hasher.verify(stored, 'aluno123')
+            medidas.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(medidas)
+
+    threads = [threading.Thread(target=cliente) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencias.sort()
+    return {
+        'method': method,
+        'logins_per_sec': round(len(latencias) / seconds, 1),
+        'p50_ms': round(latencias[len(latencias) // 2] * 1000, 1),
+        'p95_ms': round(latencias[int(len(latencias) * 0.95)] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    print(json.dumps([_run(method, args.seconds, args.clients, args.workers) for method in METHODS], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Requisições por segundo nas páginas públicas com e sem o cache de páginas
+
+Uso: python -m benchmarks.bench_page_cache [--requests 2000]
+"""
+import argparse
+import json
+import time
+
+from app import app, db_manager, page_cache
+from benchmarks import use_temp_database
+
+URLS = ['/', '/sobre', '/noticias', '/noticia/1']
+
+
+def _run(enabled, total):
+    app.config['PAGE_CACHE_ENABLED'] = enabled
+    page_cache.clear()
+    client = app.test_client()
+    resultados = {}
+    for url in URLS:
+        client.get(url)
+        inicio = time.perf_counter()
+        for _ in range(total):
+            client.get(url)
+        resultados[url] = round(total / (time.perf_counter() - inicio), 1)
+    return {'cache': enabled, 'requests_per_sec': resultados}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    use_temp_database(db_manager)
+    results = [_run(False, args.requests), _run(True, args.requests)]
+    results.append({'page_cache': page_cache.stats()})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Limite de tentativas sob ataque: rajadas bloqueadas cedo e logins legítimos preservados
+
+Uso: python -m benchmarks.bench_rate_limit [--attempts 200] [--legit 20] [--keys 1000000] [--backend memory]
+"""
+import argparse
+import json
+import time
+
+import app as modulo_app
+from app import app, db_manager
+from benchmarks import use_temp_database
+from benchmarks.datagen import BENCH_PASSWORD, generate
+from ratelimit import MemoryRateLimitStore, RateLimiter, SQLiteRateLimitStore
+
+
+def _limiter(backend, limites):
+    if backend == 'sqlite':
+        return RateLimiter(SQLiteRateLimitStore(db_manager, modulo_app.get_db), limites)
+    return RateLimiter(MemoryRateLimitStore(), limites)
+
+
+def _login(ip, username, password):
+    client = app.test_client()
+    inicio = time.perf_counter()
+    resposta = client.post('/login', data={'username': username, 'password': password},
+                           environ_base={'REMOTE_ADDR': ip})
+    return resposta, time.perf_counter() - inicio
+
+
+def _ataque(nome, tentativas):
+    """Resumo das respostas: 429 não chegam a consultar o banco nem a verificar a senha"""
+    codigos = {}
+    rejeitadas = []
+    retry_after = set()
+    for ip, username in tentativas:
+        resposta, duracao = _login(ip, username, 'senha-errada')
+        codigos[resposta.status_code] = codigos.get(resposta.status_code, 0) + 1
+        if resposta.status_code == 429:
+            rejeitadas.append(duracao)
+            retry_after.add(int(resposta.headers['Retry-After']))
+    rejeitadas.sort()
+    return {
+        'scenario': nome,
+        'attempts': len(tentativas),
+        'status': codigos,
+        'password_checks': len(tentativas) - len(rejeitadas),
+        'rejected_p50_ms': round(rejeitadas[len(rejeitadas) // 2] * 1000, 2) if rejeitadas else None,
+        'retry_after_s': sorted(retry_after)[:1] + sorted(retry_after)[-1:] if retry_after else [],
+    }
+
+
+def _legitimos(total):
+    """Outros alunos, cada um no seu IP, entrando logo após o ataque (senha certa)"""
+    ok = 0
+    for i in range(total):
+        resposta, _ = _login(f'10.1.{i // 250}.{i % 250}', f'bench.aluno{i}', BENCH_PASSWORD)
+        ok += resposta.status_code == 302
+    return {'scenario': 'legitimate', 'logins': total, 'succeeded': ok}
+
+
+def _memoria(chaves):
+    """Custo de hit() e tamanho do store com muitas chaves distintas (limitado por max_keys)"""
+    store = MemoryRateLimitStore(max_keys=100_000)
+    limiter = RateLimiter(store, {'login_ip': (30, 60)})
+    inicio = time.perf_counter()
+    for i in range(chaves):
+        limiter.hit(login_ip=f'ip{i}')
+    return {'scenario': 'distinct_keys', 'keys': chaves, 'stored': len(store),
+            'us_per_hit': round((time.perf_counter() - inicio) / chaves * 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=200)
+    parser.add_argument('--legit', type=int, default=20)
+    parser.add_argument('--keys', type=int, default=1_000_000)
+    parser.add_argument('--backend', choices=('memory', 'sqlite'), default='memory')
+    args = parser.parse_args()
+
+    use_temp_database(db_manager)
+    generate(db_manager, alunos=args.legit, professores=1, disciplinas=1, noticias=0,
+             matriculas_por_aluno=0, password_hash=modulo_app.hasher.hash(BENCH_PASSWORD))
+    app.config['PAGE_CACHE_ENABLED'] = False
+    limites = app.config['RATE_LIMITS']
+    resultados = []
+
+    # Um IP testando muitos usuários (credential stuffing): barrado pelo limite por IP
+    modulo_app.limiter = _limiter(args.backend, limites)
+    resultados.append(_ataque('one_ip_many_users',
+                              [('203.0.113.7', f'usuario{i}') for i in range(args.attempts)]))
+
+    # Muitos IPs forçando uma conta (força bruta distribuída): barrado pelo limite por usuário
+    modulo_app.limiter = _limiter(args.backend, limites)
+    resultados.append(_ataque('many_ips_one_user',
+                              [(f'198.51.{i // 250}.{i % 250}', 'ana2024') for i in range(args.attempts)]))
+    # A conta atacada fica bloqueada; as demais seguem entrando
+    resultados.append(_legitimos(args.legit))
+
+    resultados.append(_memoria(args.keys))
+    print(json.dumps({'backend': args.backend, 'limits': limites, 'results': resultados}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Vazão do servidor pré-fork (wsgi.py) conforme o número de workers
+
+Uso: python -m benchmarks.bench_workers [--workers 1,2,4] [--threads 8] [--clients 8] [--seconds 10]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import datagen
+from benchmarks.bench_load import percentile
+from models import Database
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _cliente(args):
+    """Processo cliente: requisições sequenciais até o prazo; devolve as latências"""
+    porta, segundos, noticias, seed = args
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+    latencias, erros = [], 0
+    fim = time.perf_counter() + segundos
+    while time.perf_counter() < fim:
+        url = rng.choice(['/', '/noticias', f'/noticia/{rng.randint(1, noticias)}'])
+        inicio = time.perf_counter()
+        try:
+            conn.request('GET', url)
+            r = conn.getresponse()
+            r.read()
+            if r.status != 200:
+                erros += 1
+        except (OSError, http.client.HTTPException):
+            erros += 1
+        latencias.append(time.perf_counter() - inicio)
+        conn.close()  # o wsgiref fala HTTP/1.0: uma conexão por requisição
+    return latencias, erros
+
+
+def _aguardar(porta, processo, prazo=30.0):
+    fim = time.monotonic() + prazo
+    while time.monotonic() < fim:
+        if processo.poll() is not None:
+            raise SystemExit(f"O servidor saiu com código {processo.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=1)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit("O servidor não respondeu a tempo")
+
+
+def _run(db_path, workers, threads, clientes, segundos, porta, noticias):
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'wsgi', '--workers', str(workers), '--threads', str(threads),
+         '--port', str(porta), '--host', '127.0.0.1', '--db', db_path],
+        cwd=RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _aguardar(porta, processo)
+        with multiprocessing.Pool(clientes) as pool:
+            resultados = pool.map(_cliente, [(porta, segundos, noticias, i) for i in range(clientes)])
+    finally:
+        processo.terminate()
+        processo.wait(timeout=60)
+
+    latencias = sorted(l for lats, _ in resultados for l in lats)
+    return {
+        'workers': workers,
+        'threads': threads,
+        'requests_per_sec': round(len(latencias) / segundos, 1),
+        'errors': sum(e for _, e in resultados),
+        **{f'p{int(q * 100)}_ms': round(percentile(latencias, q) * 1000, 2) for q in (0.5, 0.95, 0.99)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--size', choices=sorted(datagen.SIZES), default='10k')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    db = Database(db_path)
+    db.init_db()
+    tamanhos = datagen.SIZES[args.size]
+    datagen.generate(db, **tamanhos)
+
+    results = [_run(db_path, int(n), args.threads, args.clients, args.seconds, args.port, tamanhos['noticias'])
+               for n in args.workers.split(',')]
+    print(json.dumps({'cpus': os.cpu_count(), 'size': args.size, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Gerador determinístico de dados sintéticos (usuários, notícias, disciplinas, matrículas)
+
+Uso: python -m benchmarks.datagen --db bench.db [--size 10k|100k|1m] [--seed 42]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from models import Database
+
+# Tamanhos aproximados em total de linhas
+SIZES = {
+    '10k': dict(alunos=2_000, professores=40, disciplinas=80, noticias=1_000, matriculas_por_aluno=3),
+    '100k': dict(alunos=20_000, professores=400, disciplinas=800, noticias=10_000, matriculas_por_aluno=3),
+    '1m': dict(alunos=200_000, professores=4_000, disciplinas=8_000, noticias=100_000, matriculas_por_aluno=3),
+}
+
+# Todos os usuários gerados usam esta senha (hash calculado uma única vez)
+BENCH_PASSWORD = 'bench123'
+
+NOMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor', 'Isabela',
+         'João', 'Larissa', 'Mateus', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Thiago']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Ferreira',
+              'Almeida', 'Ribeiro', 'Carvalho', 'Gomes', 'Martins', 'Araújo', 'Rocha']
+MATERIAS = ['Matemática', 'Português', 'História', 'Geografia', 'Física', 'Química', 'Biologia',
+            'Inglês', 'Artes', 'Educação Física', 'Filosofia', 'Sociologia']
+PALAVRAS = ('escola alunos professores reunião semana projeto feira ciências matrícula calendário '
+            'avaliação biblioteca esporte campeonato visita museu formatura horário aula reforço '
+            'comunidade pais inscrições olimpíada leitura laboratório tecnologia cultura evento').split()
+
+BATCH = 10_000
+
+
+def _nome(rng):
+    return f'{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}'
+
+
+def _texto(rng, minimo, maximo):
+    return ' '.join(rng.choice(PALAVRAS) for _ in range(rng.randint(minimo, maximo)))
+
+
+def _data(rng, inicio, dias):
+    return (inicio + timedelta(seconds=rng.randrange(dias * 86400))).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _insert(db, conn, sql, rows):
+    total = 0
+    lote = []
+    for row in rows:
+        lote.append(row)
+        if len(lote) >= BATCH:
+            with db.transaction(conn):
+                conn.executemany(sql, lote)
+            total += len(lote)
+            lote.clear()
+    if lote:
+        with db.transaction(conn):
+            conn.executemany(sql, lote)
+        total += len(lote)
+    return total
+
+
+def generate(db, alunos, professores, disciplinas, noticias, matriculas_por_aluno, seed=42, password_hash=None):
+    """Preenche o banco (já inicializado) e devolve as contagens inseridas.
+
+    Os nomes de usuário são bench.aluno<N> e bench.prof<N>, todos com BENCH_PASSWORD.
+    """
+    if password_hash is None:
+        from werkzeug.security import generate_password_hash
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+    rng = random.Random(seed)
+    inicio = datetime(2022, 1, 1)
+    conn = db.connect()
+    contagens = {}
+    try:
+        sql_user = ("INSERT INTO users (nome, username, password, tipo, email, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)")
+        contagens['professores'] = _insert(db, conn, sql_user, (
+            (_nome(rng), f'bench.prof{i}', password_hash, 'professor', f'bench.prof{i}@escola.test',
+             _data(rng, inicio, 1000))
+            for i in range(professores)))
+        contagens['alunos'] = _insert(db, conn, sql_user, (
+            (_nome(rng), f'bench.aluno{i}', password_hash, 'aluno', f'bench.aluno{i}@escola.test',
+             _data(rng, inicio, 1000))
+            for i in range(alunos)))
+
+        prof_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE username LIKE 'bench.prof%'")]
+        contagens['disciplinas'] = _insert(db, conn,
+            "INSERT INTO disciplinas (nome, descricao, professor_id, carga_horaria) VALUES (?, ?, ?, ?)", (
+                (f'{rng.choice(MATERIAS)} {i}', _texto(rng, 5, 15), rng.choice(prof_ids), rng.choice((40, 60, 80)))
+                for i in range(disciplinas)))
+
+        autores = prof_ids + [r[0] for r in conn.execute("SELECT id FROM users WHERE tipo = 'admin'")]
+        contagens['noticias'] = _insert(db, conn,
+            "INSERT INTO noticias (titulo, conteudo, autor_id, destaque, data_publicacao) VALUES (?, ?, ?, ?, ?)", (
+                (_texto(rng, 4, 8).capitalize(), _texto(rng, 60, 250), rng.choice(autores),
+                 int(rng.random() < 0.05), _data(rng, inicio, 1000))
+                for _ in range(noticias)))
+
+        disc_ids = [r[0] for r in conn.execute("SELECT id FROM disciplinas")]
+        aluno_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE username LIKE 'bench.aluno%'")]
+        por_aluno = min(matriculas_por_aluno, len(disc_ids))
+        contagens['matriculas'] = _insert(db, conn,
+            "INSERT OR IGNORE INTO matriculas (aluno_id, disciplina_id, data_matricula, status) VALUES (?, ?, ?, ?)", (
+                (aluno_id, disc_id, _data(rng, inicio, 1000), 'ativo' if rng.random() < 0.9 else 'trancado')
+                for aluno_id in aluno_ids
+                for disc_id in rng.sample(disc_ids, por_aluno)))
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return contagens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help="Arquivo do banco (criado se não existir)")
+    parser.add_argument('--size', choices=sorted(SIZES), default='10k')
+    parser.add_argument('--seed', type=int, default=42)
+    for campo in SIZES['10k']:
+        parser.add_argument(f'--{campo.replace("_", "-")}', type=int, default=None,
+                            help="Sobrepõe o valor do tamanho escolhido")
+    args = parser.parse_args()
+
+    tamanhos = dict(SIZES[args.size])
+    for campo in tamanhos:
+        if getattr(args, campo) is not None:
+            tamanhos[campo] = getattr(args, campo)
+
+    db = Database(args.db)
+    db.init_db()
+    inicio = time.perf_counter()
+    contagens = generate(db, seed=args.seed, **tamanhos)
+    print(json.dumps({'db': args.db, 'size': args.size, 'seed': args.seed, 'rows': contagens,
+                      'seconds': round(time.perf_counter() - inicio, 2)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
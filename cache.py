@@ -0,0 +1,145 @@
+"""Cache de páginas completas para visitantes anônimos"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+CachedPage = namedtuple('CachedPage', 'status headers body expira_em tags')
+UserRecord = namedtuple('UserRecord', 'id nome username email tipo ativo')
+
+
+class ResponseCache:
+    """Cache LRU limitado em bytes, com TTL por entrada e invalidação por tag"""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, chave):
+        with self._lock:
+            pagina = self._entries.get(chave)
+            if pagina is None:
+                self.misses += 1
+                return None
+            if pagina.expira_em <= time.monotonic():
+                self._remove(chave)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(chave)
+            self.hits += 1
+            return pagina
+
+    def set(self, chave, status, headers, body, ttl, tags=()):
+        if len(body) > self.max_bytes:
+            return
+        pagina = CachedPage(status, headers, body, time.monotonic() + ttl, tuple(tags))
+        with self._lock:
+            if chave in self._entries:
+                self._remove(chave)
+            self._entries[chave] = pagina
+            self.bytes += len(body)
+            for tag in pagina.tags:
+                self._tags.setdefault(tag, set()).add(chave)
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Remove todas as páginas marcadas com qualquer uma das tags"""
+        with self._lock:
+            for tag in tags:
+                for chave in self._tags.pop(tag, ()):
+                    if chave in self._entries:
+                        self._remove(chave)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+            }
+
+    def _remove(self, chave):
+        pagina = self._entries.pop(chave)
+        self.bytes -= len(pagina.body)
+        for tag in pagina.tags:
+            chaves = self._tags.get(tag)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._tags[tag]
+
+
+class UserCache:
+    """Registros de usuários por id (LRU com TTL), para não consultar o banco a cada página.
+
+    O TTL limita quanto tempo outro processo pode enxergar um registro já alterado;
+    neste processo, invalidate(id) vale na hora.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, conn_factory):
+        """Registro do usuário; `conn_factory()` só é chamada se faltar no cache"""
+        with self._lock:
+            entrada = self._entries.get(user_id)
+            if entrada is not None and entrada[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entrada[0]
+            self.misses += 1
+
+        row = conn_factory().execute(
+            "SELECT id, nome, username, email, tipo, ativo FROM users WHERE id = ?", (user_id,)
+        ).fetchone()
+        user = UserRecord(*row) if row else None
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            }
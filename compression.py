@@ -0,0 +1,123 @@
+"""Middleware WSGI de compressão gzip/deflate para respostas de texto"""
+import zlib
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+# wbits do zlib para cada Content-Encoding (31 = cabeçalho gzip, 15 = zlib/deflate)
+WBITS = {'gzip': 31, 'deflate': 15}
+
+
+def etag_for_encoding(etag, encoding):
+    """ETag forte da representação comprimida: "abc" vira "abc-gzip" (a fraca fica igual)"""
+    if not etag or etag.startswith('W/'):
+        return etag
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return f'{etag}-{encoding}'
+
+
+def _accepted_encoding(header):
+    """Primeira codificação suportada aceita no Accept-Encoding (gzip tem preferência)"""
+    aceitas = {}
+    for parte in header.split(','):
+        nome, _, params = parte.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        aceitas[nome.strip().lower()] = q
+    for encoding in ('gzip', 'deflate'):
+        if aceitas.get(encoding, aceitas.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """Comprime respostas de texto acima de `min_size` bytes.
+    
+    Respostas sem Content-Length (streaming) são comprimidas bloco a bloco,
+    com flush a cada bloco, sem acumular o corpo inteiro em memória. A ETag
+    forte ganha o sufixo da codificação: os bytes não são os da identidade.
+    """
+
+    def __init__(self, app, min_size=1024, level=6):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+
+    def __call__(self, environ, start_response):
+        encoding = _accepted_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        estado = {}
+
+        def _start_response(status, headers, exc_info=None):
+            headers = list(headers)
+            if self._is_compressible(environ, status, headers):
+                self._add_vary(headers)
+                tamanho = self._header(headers, 'Content-Length')
+                streaming = tamanho is None
+                if encoding and (streaming or int(tamanho) >= self.min_size):
+                    headers = [(k, etag_for_encoding(v, encoding) if k.lower() == 'etag' else v)
+                               for k, v in headers if k.lower() != 'content-length']
+                    headers.append(('Content-Encoding', encoding))
+                    estado['compressor'] = zlib.compressobj(self.level, zlib.DEFLATED, WBITS[encoding])
+                    estado['streaming'] = streaming
+            write = start_response(status, headers, exc_info)
+            if 'compressor' not in estado:
+                return write
+            return lambda dados: write(estado['compressor'].compress(dados)
+                                       + estado['compressor'].flush(zlib.Z_SYNC_FLUSH))
+
+        corpo = self.app(environ, _start_response)
+        if 'compressor' not in estado:
+            return corpo
+        return self._compress(corpo, estado['compressor'], estado['streaming'])
+
+    def _compress(self, corpo, compressor, streaming):
+        try:
+            for bloco in corpo:
+                dados = compressor.compress(bloco)
+                if streaming:
+                    dados += compressor.flush(zlib.Z_SYNC_FLUSH)
+                if dados:
+                    yield dados
+            yield compressor.flush()
+        finally:
+            if hasattr(corpo, 'close'):
+                corpo.close()
+
+    def _is_compressible(self, environ, status, headers):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return False
+        if status[:3] in ('204', '206', '304') or not status.startswith('2'):
+            return False
+        if self._header(headers, 'Content-Encoding'):
+            return False
+        if 'no-transform' in (self._header(headers, 'Cache-Control') or ''):
+            return False
+        tipo = (self._header(headers, 'Content-Type') or '').lower()
+        return tipo.startswith(COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def _header(headers, nome):
+        nome = nome.lower()
+        for chave, valor in headers:
+            if chave.lower() == nome:
+                return valor
+        return None
+
+    @staticmethod
+    def _add_vary(headers):
+        for i, (chave, valor) in enumerate(headers):
+            if chave.lower() == 'vary':
+                if 'accept-encoding' not in valor.lower():
+                    headers[i] = (chave, f"{valor}, Accept-Encoding")
+                return
+        headers.append(('Vary', 'Accept-Encoding'))
@@ -0,0 +1,124 @@
+"""Matrículas em lote, listas de alunos por disciplina e carga horária dos professores"""
+import re
+from collections import namedtuple
+
+# Alunos por instrução (IN com um parâmetro por id, bem abaixo do limite do SQLite)
+BATCH_SIZE = 500
+
+# Listagens paginadas com keyset_page
+DISCIPLINAS_SELECT = ("SELECT d.id, d.nome, d.descricao, d.carga_horaria, p.nome AS professor_nome "
+                      "FROM disciplinas d LEFT JOIN users p ON p.id = d.professor_id")
+DISCIPLINA_QUERY = f"{DISCIPLINAS_SELECT} WHERE d.id = ?"
+ROSTER_SELECT = ("SELECT m.aluno_id, u.id, u.nome, u.username, u.ativo, m.status, m.data_matricula "
+                 "FROM matriculas m JOIN users u ON u.id = m.aluno_id")
+
+# {} recebe um placeholder por disciplina
+COUNTS_QUERY = '''
+    SELECT disciplina_id, SUM(status = 'ativo'), SUM(status != 'ativo')
+    FROM matriculas
+    WHERE disciplina_id IN ({})
+    GROUP BY disciplina_id
+'''
+ORPHANS_QUERY = '''
+    SELECT id, aluno_id, disciplina_id FROM matriculas
+    WHERE aluno_id NOT IN (SELECT id FROM users)
+    ORDER BY id
+'''
+TEACHING_LOADS_QUERY = '''
+    SELECT p.id, p.nome, p.username, p.email, p.telefone, p.created_at, p.ativo,
+           COUNT(d.id),
+           COALESCE(SUM(d.carga_horaria), 0),
+           COALESCE(SUM((SELECT COUNT(*) FROM matriculas m
+                         WHERE m.disciplina_id = d.id AND m.status = 'ativo')), 0)
+    FROM users p
+    LEFT JOIN disciplinas d ON d.professor_id = p.id
+    WHERE p.tipo = 'professor'
+    GROUP BY p.id
+    ORDER BY p.nome
+'''
+
+ContagemMatriculas = namedtuple('ContagemMatriculas', 'ativos trancados')
+CargaProfessor = namedtuple('CargaProfessor',
+                            'id nome username email telefone created_at ativo disciplinas carga_horaria alunos')
+
+SEM_MATRICULAS = ContagemMatriculas(0, 0)
+
+
+def parse_ids(texto):
+    """IDs digitados (separados por vírgula, espaço ou linha), sem repetição e na ordem"""
+    return list(dict.fromkeys(int(n) for n in re.findall(r'\d+', texto or '')))
+
+
+def _lotes(ids, tamanho):
+    for i in range(0, len(ids), tamanho):
+        yield ids[i:i + tamanho]
+
+
+class EnrollmentService:
+    """Operações de matrícula sobre a conexão da requisição.
+
+    Cada operação em lote roda numa única transação, com um INSERT/DELETE por
+    bloco de `batch_size` alunos em vez de um por aluno.
+    """
+
+    def __init__(self, db, batch_size=BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+
+    def enroll(self, conn, disciplina_id, aluno_ids):
+        """Matricula os alunos na disciplina; devolve quantas matrículas foram criadas.
+
+        Ids que não são de alunos são ignorados, e quem já tem matrícula na
+        disciplina (ativa ou trancada) fica como está (INSERT OR IGNORE).
+        """
+        ids = list(dict.fromkeys(aluno_ids))
+        criadas = 0
+        with self.db.transaction(conn):
+            if conn.execute("SELECT 1 FROM disciplinas WHERE id = ?", (disciplina_id,)).fetchone() is None:
+                raise ValueError("Disciplina não encontrada.")
+            for lote in _lotes(ids, self.batch_size):
+                criadas += conn.execute(f'''
+                    INSERT OR IGNORE INTO matriculas (aluno_id, disciplina_id)
+                    SELECT id, ? FROM users WHERE tipo = 'aluno' AND id IN ({', '.join('?' * len(lote))})
+                ''', (disciplina_id, *lote)).rowcount
+        return criadas
+
+    def unenroll(self, conn, disciplina_id, aluno_ids):
+        """Remove as matrículas dos alunos na disciplina; devolve quantas foram removidas"""
+        ids = list(dict.fromkeys(aluno_ids))
+        removidas = 0
+        with self.db.transaction(conn):
+            for lote in _lotes(ids, self.batch_size):
+                removidas += conn.execute(
+                    f"DELETE FROM matriculas WHERE disciplina_id = ? AND aluno_id IN ({', '.join('?' * len(lote))})",
+                    (disciplina_id, *lote)).rowcount
+        return removidas
+
+    def orphans(self, conn):
+        """Matrículas de alunos que não existem mais (removidos antes do trigger da migração 8)"""
+        return conn.execute(ORPHANS_QUERY).fetchall()
+
+    def delete_orphans(self, conn, matricula_ids):
+        """Remove as matrículas órfãs indicadas; devolve quantas foram removidas"""
+        ids = list(matricula_ids)
+        removidas = 0
+        with self.db.transaction(conn):
+            for lote in _lotes(ids, self.batch_size):
+                removidas += conn.execute(
+                    "DELETE FROM matriculas WHERE aluno_id NOT IN (SELECT id FROM users) "
+                    f"AND id IN ({', '.join('?' * len(lote))})", lote).rowcount
+        return removidas
+
+    def counts(self, conn, disciplina_ids):
+        """{disciplina_id: ContagemMatriculas} de várias disciplinas numa consulta agrupada"""
+        ids = list(disciplina_ids)
+        if not ids:
+            return {}
+        rows = conn.execute(COUNTS_QUERY.format(', '.join('?' * len(ids))), ids).fetchall()
+        contagens = {r[0]: ContagemMatriculas(r[1], r[2]) for r in rows}
+        return {i: contagens.get(i, SEM_MATRICULAS) for i in ids}
+
+    def teaching_loads(self, conn):
+        """Professores com nº de disciplinas, soma da carga horária e alunos ativos (uma consulta)"""
+        rows = conn.execute(TEACHING_LOADS_QUERY).fetchall()
+        return [CargaProfessor(*r) for r in rows]
@@ -0,0 +1,100 @@
+"""Exportação em streaming (CSV/NDJSON) de alunos, professores, disciplinas e matrículas"""
+import csv
+import io
+import json
+import zlib
+
+# Colunas exportáveis por tabela (a senha nunca sai) e a consulta base
+EXPORTS = {
+    'alunos': (
+        ['id', 'nome', 'username', 'email', 'telefone', 'endereco', 'data_nascimento', 'created_at', 'ativo'],
+        "SELECT {colunas} FROM users WHERE tipo = 'aluno' ORDER BY id",
+    ),
+    'professores': (
+        ['id', 'nome', 'username', 'email', 'telefone', 'created_at', 'ativo'],
+        "SELECT {colunas} FROM users WHERE tipo = 'professor' ORDER BY id",
+    ),
+    'disciplinas': (
+        ['id', 'nome', 'descricao', 'professor_id', 'carga_horaria'],
+        "SELECT {colunas} FROM disciplinas ORDER BY id",
+    ),
+    'matriculas': (
+        ['id', 'aluno_id', 'disciplina_id', 'data_matricula', 'status'],
+        "SELECT {colunas} FROM matriculas ORDER BY id",
+    ),
+}
+
+FORMATOS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def resolve_columns(tabela, colunas=None):
+    """Valida a seleção de colunas; devolve a lista final ou levanta ValueError"""
+    if tabela not in EXPORTS:
+        raise ValueError(f"tabela desconhecida: {tabela}")
+    permitidas = EXPORTS[tabela][0]
+    if not colunas:
+        return list(permitidas)
+    invalidas = [c for c in colunas if c not in permitidas]
+    if invalidas:
+        raise ValueError(f"coluna(s) inválida(s) para {tabela}: {', '.join(invalidas)}")
+    return list(colunas)
+
+
+def iter_rows(conn, tabela, colunas, batch_size=1000):
+    """Percorre o cursor com fetchmany, mantendo em memória só um lote por vez"""
+    query = EXPORTS[tabela][1].format(colunas=', '.join(colunas))
+    cursor = conn.execute(query)
+    while True:
+        lote = cursor.fetchmany(batch_size)
+        if not lote:
+            break
+        yield lote
+
+
+def encode(lotes, colunas, formato):
+    """Converte cada lote num único bloco de texto CSV ou NDJSON"""
+    buffer = io.StringIO()
+    if formato == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(colunas)
+        yield buffer.getvalue()
+    for lote in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        if formato == 'csv':
+            writer.writerows(tuple(row) for row in lote)
+        else:
+            for row in lote:
+                buffer.write(json.dumps(dict(zip(colunas, row)), ensure_ascii=False))
+                buffer.write('\n')
+        yield buffer.getvalue()
+
+
+def gzip_chunks(blocos, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for bloco in blocos:
+        dados = compressor.compress(bloco.encode())
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+
+def export(db, tabela, colunas, formato='csv', compress=False, batch_size=1000):
+    """Gerador completo da exportação.
+
+    Abre uma conexão própria, fora do pool: um download lento não ocupa
+    uma das conexões das páginas.
+    """
+    conn = db.connect()
+    try:
+        blocos = encode(iter_rows(conn, tabela, colunas, batch_size), colunas, formato)
+        if compress:
+            yield from gzip_chunks(blocos)
+        else:
+            for bloco in blocos:
+                yield bloco.encode()
+    finally:
+        conn.close()
@@ -0,0 +1,158 @@
+"""Upload de imagens das notícias: nomes por hash do conteúdo e variantes redimensionadas"""
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow é opcional: sem ele, só o original é guardado
+    Image = None
+
+# Assinaturas aceitas (o nome e o Content-Type do upload não são confiáveis)
+TIPOS = [
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+
+# Larguras geradas em segundo plano, da menor para a maior
+VARIANTS = {'thumb': 320, 'card': 640}
+
+logger = logging.getLogger(__name__)
+
+NOME_HASH = re.compile(r'^[0-9a-f]{24}(-\d+w)?\.(jpg|png|gif|webp)$')
+
+
+def sniff(dados):
+    """Extensão da imagem pelos primeiros bytes, ou None se não for um tipo aceito"""
+    for assinatura, ext in TIPOS:
+        if dados.startswith(assinatura):
+            return ext
+    if dados[:4] == b'RIFF' and dados[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def is_hashed(nome):
+    """Arquivo nomeado pelo hash do conteúdo (pode ser cacheado para sempre)"""
+    return bool(NOME_HASH.match(nome))
+
+
+class ImageStore:
+    """Guarda o original como <sha256>.<ext> e gera <sha256>-<largura>w.<ext> num pool de threads.
+
+    Uploads iguais caem no mesmo nome e não são regravados. `on_ready(nome)` é
+    chamado (na thread do pool) quando as variantes de uma imagem ficam prontas.
+    """
+
+    def __init__(self, folder, variants=VARIANTS, workers=2, quality=82, on_ready=None):
+        self.folder = folder
+        self.variants = variants
+        self.quality = quality
+        self.on_ready = on_ready
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='imagens')
+        self._prontas = {}
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def save(self, arquivo):
+        """Valida e grava o upload (FileStorage); devolve o nome do original.
+
+        As variantes são geradas depois, sem segurar a requisição.
+        """
+        dados = arquivo.read()
+        ext = sniff(dados)
+        if ext is None:
+            raise ValueError("Formato de imagem não suportado (use JPEG, PNG, GIF ou WebP).")
+        if Image is not None:
+            try:
+                with Image.open(io.BytesIO(dados)) as img:
+                    img.verify()
+            except Exception:
+                raise ValueError("Arquivo de imagem inválido ou corrompido.")
+
+        nome = f"{hashlib.sha256(dados).hexdigest()[:24]}.{ext}"
+        caminho = os.path.join(self.folder, nome)
+        if not os.path.exists(caminho):
+            self._write(caminho, dados)
+        if Image is not None and not self._has_variants(nome):
+            self._executor.submit(self._make_variants_safe, nome)
+        return nome
+
+    def variants_for(self, nome):
+        """[(arquivo, largura)] das variantes já geradas, da menor para a maior"""
+        with self._lock:
+            prontas = self._prontas.get(nome)
+        if prontas is not None:
+            return prontas
+        base, ext = self._variant_base(nome)
+        prontas = [(f"{base}-{largura}w.{ext}", largura) for largura in sorted(self.variants.values())
+                   if os.path.exists(os.path.join(self.folder, f"{base}-{largura}w.{ext}"))]
+        if len(prontas) == len(self.variants):
+            # Só memoriza quando completo: as pendentes são conferidas de novo
+            with self._lock:
+                self._prontas[nome] = prontas
+        return prontas
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _has_variants(self, nome):
+        return len(self.variants_for(nome)) == len(self.variants)
+
+    def _variant_base(self, nome):
+        base, ext = os.path.splitext(nome)
+        # GIF (possivelmente animado) vira PNG estático nas miniaturas
+        return base, 'png' if ext == '.gif' else ext[1:]
+
+    def _make_variants_safe(self, nome):
+        try:
+            self._make_variants(nome)
+        except Exception:
+            # Sem variantes, os templates usam o original
+            logger.exception("Falha ao gerar variantes de %s", nome)
+
+    def _make_variants(self, nome):
+        base, ext = self._variant_base(nome)
+        formato = {'jpg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP'}[ext]
+        with Image.open(os.path.join(self.folder, nome)) as original:
+            original = ImageOps.exif_transpose(original)
+            for largura in sorted(self.variants.values(), reverse=True):
+                destino = os.path.join(self.folder, f"{base}-{largura}w.{ext}")
+                if os.path.exists(destino):
+                    continue
+                img = original.copy()
+                # thumbnail() mantém a proporção e nunca amplia
+                img.thumbnail((largura, largura * 4))
+                if formato == 'JPEG' and img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                opcoes = {'quality': self.quality, 'optimize': True}
+                if formato == 'JPEG':
+                    opcoes['progressive'] = True
+                self._write_image(destino, img, formato, opcoes)
+        if self.on_ready is not None:
+            self.on_ready(nome)
+
+    def _write(self, caminho, dados):
+        self._write_atomic(caminho, lambda f: f.write(dados))
+
+    def _write_image(self, caminho, img, formato, opcoes):
+        self._write_atomic(caminho, lambda f: img.save(f, formato, **opcoes))
+
+    def _write_atomic(self, caminho, escrever):
+        """Grava num temporário e renomeia: quem lê nunca vê um arquivo pela metade"""
+        fd, tmp = tempfile.mkstemp(dir=self.folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                escrever(f)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, caminho)
+        except BaseException:
+            os.unlink(tmp)
+            raise
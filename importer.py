@@ -0,0 +1,241 @@
+"""Importação em lote de alunos (CSV ou JSONL) com inserts agrupados em transações"""
+import csv
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from passwords import UNUSABLE_PASSWORD
+
+CAMPOS = ('nome', 'username', 'password', 'email', 'telefone', 'endereco', 'data_nascimento')
+
+USERNAME_RE = re.compile(r'^[\w.-]{3,50}$')
+
+# Senha que nunca confere: aluno importado sem senha só entra depois que um admin definir uma
+SENHA_BLOQUEADA = UNUSABLE_PASSWORD
+
+MAX_ERROS = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def read_rows(stream, formato):
+    """Lê o arquivo linha a linha, sem carregá-lo inteiro: gera (nº da linha, dict)"""
+    if formato == 'jsonl':
+        for numero, linha in enumerate(stream, start=1):
+            if linha.strip():
+                try:
+                    yield numero, json.loads(linha)
+                except ValueError:
+                    yield numero, None
+    else:
+        leitor = csv.DictReader(stream)
+        for registro in leitor:
+            yield leitor.line_num, registro
+
+
+class StudentImporter:
+    """Valida e insere alunos em blocos de `chunk_size`, um commit por bloco.
+    
+    Usernames já existentes (no banco ou repetidos no arquivo) são
+    reportados por linha e pulados, sem abortar o restante do lote.
+    As senhas recebem o custo normal do `hasher`, calculadas num pool de
+    `processes` processos (padrão: um por CPU) que só a importação usa.
+    """
+
+    def __init__(self, db, hasher, chunk_size=1000, processes=None):
+        self.db = db
+        self.hasher = hasher
+        self.chunk_size = chunk_size
+        self.processes = processes
+
+    def import_stream(self, stream, formato='csv'):
+        inicio = time.perf_counter()
+        relatorio = {'linhas': 0, 'importados': 0, 'matriculas': 0, 'erros': [], 'total_erros': 0,
+                     'senhas': 0, 'segundos_senhas': 0.0}
+        vistos = set()
+
+        conn = self.db.connect()
+        try:
+            with self.hasher.bulk(self.processes) as hash_many:
+                disciplinas = {row[0] for row in conn.execute("SELECT id FROM disciplinas")}
+                linhas = read_rows(stream, formato)
+                while True:
+                    bloco = list(islice(linhas, self.chunk_size))
+                    if not bloco:
+                        break
+                    relatorio['linhas'] += len(bloco)
+                    validos = []
+                    for numero, registro in bloco:
+                        aluno, erro = self._validate(registro, disciplinas)
+                        if erro is None and aluno['username'] in vistos:
+                            erro = f"username '{aluno['username']}' repetido no arquivo"
+                        if erro:
+                            self._error(relatorio, numero, erro)
+                            continue
+                        vistos.add(aluno['username'])
+                        validos.append((numero, aluno))
+                    self._insert_chunk(conn, validos, relatorio, hash_many)
+        finally:
+            conn.close()
+
+        relatorio['erros'].sort()
+        relatorio['segundos_senhas'] = round(relatorio['segundos_senhas'], 3)
+        segundos = time.perf_counter() - inicio
+        relatorio['segundos'] = round(segundos, 3)
+        relatorio['linhas_por_segundo'] = round(relatorio['linhas'] / segundos, 1) if segundos else 0.0
+        return relatorio
+
+    def _insert_chunk(self, conn, validos, relatorio, hash_many):
+        if not validos:
+            return
+        inicio = time.perf_counter()
+        senhas = hash_many([a['password'] for _, a in validos if a['password']])
+        relatorio['senhas'] += len(senhas)
+        relatorio['segundos_senhas'] += time.perf_counter() - inicio
+        senhas = iter(senhas)
+        for _, aluno in validos:
+            aluno['password'] = next(senhas) if aluno['password'] else SENHA_BLOQUEADA
+
+        with self.db.transaction(conn):
+            usernames = [a['username'] for _, a in validos]
+            marcadores = ', '.join('?' * len(usernames))
+            existentes = {row[0] for row in conn.execute(
+                f"SELECT username FROM users WHERE username IN ({marcadores})", usernames)}
+
+            novos = []
+            for numero, aluno in validos:
+                if aluno['username'] in existentes:
+                    self._error(relatorio, numero, f"username '{aluno['username']}' já existe")
+                else:
+                    novos.append(aluno)
+            if not novos:
+                return
+
+            conn.executemany(f'''
+                INSERT INTO users ({', '.join(CAMPOS)}, tipo)
+                VALUES ({', '.join('?' * len(CAMPOS))}, 'aluno')
+            ''', [tuple(a[c] for c in CAMPOS) for a in novos])
+            relatorio['importados'] += len(novos)
+
+            com_disciplinas = [a for a in novos if a['disciplinas']]
+            if com_disciplinas:
+                nomes = [a['username'] for a in com_disciplinas]
+                ids = dict(conn.execute(
+                    f"SELECT username, id FROM users WHERE username IN ({', '.join('?' * len(nomes))})",
+                    nomes).fetchall())
+                matriculas = [(ids[a['username']], d) for a in com_disciplinas for d in a['disciplinas']]
+                cursor = conn.executemany(
+                    "INSERT OR IGNORE INTO matriculas (aluno_id, disciplina_id) VALUES (?, ?)", matriculas)
+                relatorio['matriculas'] += cursor.rowcount
+
+    def _validate(self, registro, disciplinas):
+        if not isinstance(registro, dict):
+            return None, "linha inválida"
+        aluno = {c: str(registro.get(c) or '').strip() for c in CAMPOS}
+        aluno['password'] = str(registro.get('password') or '')
+        if not aluno['nome']:
+            return None, "nome é obrigatório"
+        if not USERNAME_RE.match(aluno['username']):
+            return None, f"username inválido: '{aluno['username']}'"
+        if aluno['data_nascimento']:
+            try:
+                datetime.strptime(aluno['data_nascimento'], '%Y-%m-%d')
+            except ValueError:
+                return None, f"data_nascimento inválida: '{aluno['data_nascimento']}' (use AAAA-MM-DD)"
+
+        bruto = registro.get('disciplinas') or []
+        if isinstance(bruto, str):
+            bruto = [d for d in re.split(r'[;,\s]+', bruto) if d]
+        try:
+            ids = {int(d) for d in bruto}
+        except (TypeError, ValueError):
+            return None, f"disciplinas inválidas: {bruto!r}"
+        desconhecidas = ids - disciplinas
+        if desconhecidas:
+            return None, f"disciplina(s) inexistente(s): {sorted(desconhecidas)}"
+        aluno['disciplinas'] = sorted(ids)
+        return aluno, None
+
+    def _error(self, relatorio, numero, mensagem):
+        relatorio['total_erros'] += 1
+        if len(relatorio['erros']) < MAX_ERROS:
+            relatorio['erros'].append((numero, mensagem))
+
+class ImportQueue:
+    """Importações enviadas pelo painel, fora da thread HTTP.
+
+    O upload é copiado para um arquivo temporário e uma thread do processo
+    roda uma importação por vez. Andamento e relatório ficam na tabela
+    `importacoes`, que qualquer worker consulta. `on_done(relatorio)` é
+    chamado (na thread da fila) quando uma importação termina.
+    """
+
+    def __init__(self, db, importer_factory, on_done=None):
+        self.db = db
+        self.importer_factory = importer_factory
+        self.on_done = on_done
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='importacao')
+
+    def submit(self, arquivo, formato):
+        """Guarda o upload (FileStorage) e enfileira a importação; devolve o id dela"""
+        fd, caminho = tempfile.mkstemp(prefix='importacao-', suffix=f'.{formato}')
+        with os.fdopen(fd, 'wb') as destino:
+            shutil.copyfileobj(arquivo.stream, destino)
+        conn = self.db.connect()
+        try:
+            with self.db.transaction(conn):
+                importacao_id = conn.execute("INSERT INTO importacoes (arquivo, formato) VALUES (?, ?)",
+                                             (arquivo.filename, formato)).lastrowid
+        except BaseException:
+            os.unlink(caminho)
+            raise
+        finally:
+            conn.close()
+        self._executor.submit(self._run, importacao_id, caminho, formato)
+        return importacao_id
+
+    def get(self, conn, importacao_id):
+        """Estado da importação como dict (relatório já decodificado), ou None"""
+        row = conn.execute("SELECT * FROM importacoes WHERE id = ?", (importacao_id,)).fetchone()
+        if row is None:
+            return None
+        importacao = dict(row)
+        importacao['relatorio'] = json.loads(row['relatorio']) if row['relatorio'] else None
+        return importacao
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, importacao_id, caminho, formato):
+        self._update(importacao_id, 'rodando')
+        try:
+            with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+                relatorio = self.importer_factory().import_stream(arquivo, formato)
+        except Exception:
+            logger.exception("Falha na importação %s", importacao_id)
+            self._update(importacao_id, 'falhou')
+            return
+        finally:
+            os.unlink(caminho)
+        self._update(importacao_id, 'concluída', relatorio)
+        if self.on_done is not None:
+            self.on_done(relatorio)
+
+    def _update(self, importacao_id, status, relatorio=None):
+        fim = status in ('concluída', 'falhou')
+        conn = self.db.connect()
+        try:
+            with self.db.transaction(conn):
+                conn.execute(
+                    "UPDATE importacoes SET status = ?, relatorio = ?, "
+                    "concluida_em = CASE WHEN ? THEN CURRENT_TIMESTAMP END WHERE id = ?",
+                    (status, json.dumps(relatorio) if relatorio is not None else None, fim, importacao_id))
+        finally:
+            conn.close()
@@ -0,0 +1,342 @@
+"""Instrumentação por requisição: tempo de SQL e de templates, histogramas por rota"""
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+# Limites superiores (segundos) dos baldes de latência
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QueryLog:
+    """Instruções SQL de uma requisição: [sql, parametros, duracao] na ordem de execução"""
+
+    __slots__ = ('entries',)
+
+    def __init__(self):
+        self.entries = []
+
+    def record(self, sql, params, duracao):
+        entrada = [sql, params, duracao]
+        self.entries.append(entrada)
+        return entrada
+
+    @property
+    def count(self):
+        return len(self.entries)
+
+    @property
+    def total(self):
+        return sum(e[2] for e in self.entries)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que cronometra execute() e os fetch*() do resultado.
+
+    O SQLite só avança as linhas durante o fetch, então esse tempo é somado
+    à mesma instrução. Sem QueryLog na conexão o custo é um teste de None.
+    """
+
+    _entrada = None
+
+    def execute(self, sql, parameters=()):
+        log = self.connection.query_log
+        if log is None:
+            return super().execute(sql, parameters)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._entrada = log.record(sql, parameters, time.perf_counter() - inicio)
+
+    def executemany(self, sql, seq_of_parameters):
+        log = self.connection.query_log
+        if log is None:
+            return super().executemany(sql, seq_of_parameters)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._entrada = log.record(sql, None, time.perf_counter() - inicio)
+
+    def _fetch(self, metodo, *args):
+        if self._entrada is None:
+            return metodo(*args)
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args)
+        finally:
+            self._entrada[2] += time.perf_counter() - inicio
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexão cujos cursores registram no `query_log` atual (None = desligado)"""
+
+    query_log = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if self.query_log is None:
+            return super().commit()
+        inicio = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            self.query_log.record('COMMIT', None, time.perf_counter() - inicio)
+
+
+# Normalização do SQL: literais viram "?" para agrupar consultas iguais
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACOS = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """SQL normalizado: literais e listas IN (?, ?, ...) trocados por marcadores"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMERO.sub('?', sql)
+    sql = _ESPACOS.sub(' ', sql).strip()
+    return _LISTA.sub('(?+)', sql)
+
+
+def params_shape(params):
+    """Tipos dos parâmetros, sem os valores (que podem conter dados pessoais)"""
+    if params is None:
+        return 'executemany'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in params.items()) + '}'
+    return '(' + ', '.join(type(v).__name__ for v in params) + ')'
+
+
+class SlowQuery:
+    __slots__ = ('sql', 'params', 'rota', 'count', 'total', 'max', 'ultima', 'plano', 'visto_em')
+
+    @property
+    def media(self):
+        return self.total / self.count
+
+
+class SlowQueryLog:
+    """Consultas acima de `threshold` segundos, agrupadas pelo SQL normalizado.
+
+    Guarda no máximo `capacity` consultas distintas (sai a vista há mais tempo).
+    O EXPLAIN QUERY PLAN é refeito sempre que a consulta bate seu próprio recorde.
+    """
+
+    def __init__(self, threshold=0.05, capacity=200, logger=None):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.logger = logger
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, sql, params, duracao, rota, explain=None):
+        """Registra a instrução se for lenta; `explain(sql, params)` devolve o plano"""
+        if duracao < self.threshold:
+            return False
+        chave = fingerprint(sql)
+        with self._lock:
+            entrada = self._entries.get(chave)
+            recorde = entrada is None or duracao > entrada.max
+        plano = None
+        if recorde and explain is not None and params is not None:
+            try:
+                plano = explain(sql, params)
+            except sqlite3.Error as e:
+                plano = [f'(EXPLAIN falhou: {e})']
+
+        with self._lock:
+            entrada = self._entries.pop(chave, None)
+            if entrada is None:
+                entrada = SlowQuery()
+                entrada.sql = chave
+                entrada.count = 0
+                entrada.total = entrada.max = 0.0
+                entrada.plano = None
+            entrada.params = params_shape(params)
+            entrada.rota = rota
+            entrada.count += 1
+            entrada.total += duracao
+            entrada.ultima = duracao
+            entrada.max = max(entrada.max, duracao)
+            entrada.visto_em = time.time()
+            if plano is not None:
+                entrada.plano = plano
+            self._entries[chave] = entrada
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+        if self.logger is not None:
+            self.logger.warning('%.1fms %s %s %s | %s', duracao * 1000, rota, chave,
+                                params_shape(params), ' | '.join(plano or ()))
+        return True
+
+    def entries(self, ordem='total'):
+        """Cópia das consultas registradas, da mais custosa para a menos"""
+        with self._lock:
+            entradas = list(self._entries.values())
+        return sorted(entradas, key=lambda e: getattr(e, ordem), reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def server_timing(total, query_log, template_time):
+    """Valor do cabeçalho Server-Timing (durações em milissegundos)"""
+    partes = []
+    if query_log is not None:
+        partes.append(f'db;desc="{query_log.count} SQL";dur={query_log.total * 1000:.2f}')
+    partes.append(f'tpl;desc="Templates";dur={template_time * 1000:.2f}')
+    partes.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(partes)
+
+
+class LatencyHistogram:
+    """Histograma de baldes fixos; os quantis são interpolados dentro do balde"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, valor):
+        self.counts[bisect_left(self.buckets, valor)] += 1
+        self.count += 1
+        self.sum += valor
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        alvo = q * self.count
+        acumulado = 0
+        for i, n in enumerate(self.counts):
+            if n and acumulado + n >= alvo:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                inferior = self.buckets[i - 1] if i else 0.0
+                return inferior + (self.buckets[i] - inferior) * (alvo - acumulado) / n
+            acumulado += n
+        return self.buckets[-1]
+
+
+class RouteStats:
+    __slots__ = ('latencia', 'status', 'sql_count', 'sql_seconds', 'template_seconds')
+
+    def __init__(self, buckets):
+        self.latencia = LatencyHistogram(buckets)
+        self.status = {}
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class RequestMetrics:
+    """Agrega as requisições por (rota, método) e gera o texto do Prometheus"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._rotas = {}
+        self._lock = threading.Lock()
+
+    def observe(self, rota, metodo, status, total, query_log, template_time):
+        with self._lock:
+            chave = (rota, metodo)
+            estat = self._rotas.get(chave)
+            if estat is None:
+                estat = self._rotas[chave] = RouteStats(self.buckets)
+            estat.latencia.observe(total)
+            estat.status[status] = estat.status.get(status, 0) + 1
+            estat.template_seconds += template_time
+            if query_log is not None:
+                estat.sql_count += query_log.count
+                estat.sql_seconds += query_log.total
+
+    def reset(self):
+        with self._lock:
+            self._rotas.clear()
+
+    def render(self, gauges=None):
+        """Formato de exposição em texto do Prometheus (version 0.0.4)"""
+        linhas = []
+
+        def familia(nome, tipo, ajuda):
+            linhas.append(f'# HELP {nome} {ajuda}')
+            linhas.append(f'# TYPE {nome} {tipo}')
+
+        with self._lock:
+            rotas = sorted(self._rotas.items())
+
+            familia('app_requests_total', 'counter', 'Requisições por rota, método e status')
+            for (rota, metodo), estat in rotas:
+                for status, n in sorted(estat.status.items()):
+                    linhas.append(f'app_requests_total{{{_labels(rota, metodo)},status="{status}"}} {n}')
+
+            familia('app_request_duration_seconds', 'histogram', 'Latência das requisições por rota')
+            for (rota, metodo), estat in rotas:
+                labels = _labels(rota, metodo)
+                acumulado = 0
+                for limite, n in zip(self.buckets, estat.latencia.counts):
+                    acumulado += n
+                    linhas.append(f'app_request_duration_seconds_bucket{{{labels},le="{limite}"}} {acumulado}')
+                linhas.append(f'app_request_duration_seconds_bucket{{{labels},le="+Inf"}} {estat.latencia.count}')
+                linhas.append(f'app_request_duration_seconds_sum{{{labels}}} {estat.latencia.sum:.6f}')
+                linhas.append(f'app_request_duration_seconds_count{{{labels}}} {estat.latencia.count}')
+
+            familia('app_request_latency_seconds', 'summary', 'Quantis p50/p95/p99 estimados do histograma')
+            for (rota, metodo), estat in rotas:
+                labels = _labels(rota, metodo)
+                for q in QUANTILES:
+                    linhas.append(f'app_request_latency_seconds{{{labels},quantile="{q}"}} '
+                                  f'{estat.latencia.quantile(q):.6f}')
+                linhas.append(f'app_request_latency_seconds_sum{{{labels}}} {estat.latencia.sum:.6f}')
+                linhas.append(f'app_request_latency_seconds_count{{{labels}}} {estat.latencia.count}')
+
+            familia('app_sql_queries_total', 'counter', 'Instruções SQL executadas por rota')
+            for (rota, metodo), estat in rotas:
+                linhas.append(f'app_sql_queries_total{{{_labels(rota, metodo)}}} {estat.sql_count}')
+
+            familia('app_sql_duration_seconds_total', 'counter', 'Tempo gasto em SQL por rota')
+            for (rota, metodo), estat in rotas:
+                linhas.append(f'app_sql_duration_seconds_total{{{_labels(rota, metodo)}}} {estat.sql_seconds:.6f}')
+
+            familia('app_template_duration_seconds_total', 'counter', 'Tempo gasto renderizando templates por rota')
+            for (rota, metodo), estat in rotas:
+                linhas.append(f'app_template_duration_seconds_total{{{_labels(rota, metodo)}}} '
+                              f'{estat.template_seconds:.6f}')
+
+        for nome, valores in (gauges or {}).items():
+            familia(nome, 'gauge', nome.replace('_', ' '))
+            for chave, valor in sorted(valores.items()):
+                linhas.append(f'{nome}{{chave="{_escape(chave)}"}} {valor}')
+        return '\n'.join(linhas) + '\n'
+
+
+def _escape(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(rota, metodo):
+    return f'route="{_escape(rota)}",method="{metodo}"'
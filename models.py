@@ -1,20 +1,586 @@
 import sqlite3
 import os
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
 from datetime import datetime
+from metrics import InstrumentedConnection
+
+# Perfil de armazenamento aplicado a toda conexão nova
+STORAGE_PROFILE = {
+    'busy_timeout': 5000,        # ms esperando lock antes de "database is locked"
+    'journal_mode': 'WAL',       # leitores não bloqueiam o escritor (e vice-versa)
+    'synchronous': 'NORMAL',     # seguro em WAL, sem fsync a cada commit
+    'cache_size': -16000,        # ~16MB de cache de páginas por conexão
+    'mmap_size': 134217728,      # 128MB mapeados em memória
+    'temp_store': 'MEMORY',
+}
+
+# Contagens exatas usadas para semear e conferir a tabela estatisticas
+STATS_QUERIES = {
+    'admin': "SELECT COUNT(*) FROM users WHERE tipo = 'admin' AND ativo = 1",
+    'professor': "SELECT COUNT(*) FROM users WHERE tipo = 'professor' AND ativo = 1",
+    'aluno': "SELECT COUNT(*) FROM users WHERE tipo = 'aluno' AND ativo = 1",
+    'disciplinas': "SELECT COUNT(*) FROM disciplinas",
+    'noticias': "SELECT COUNT(*) FROM noticias",
+}
+
+# Modelo de leitura das notícias: tamanho do resumo guardado (templates mostram até 150)
+FEED_RESUMO = 200
+# Slug de títulos sem nenhuma letra ou número (ex.: "!!!")
+FEED_SLUG_PADRAO = 'noticia'
+
+# lower() do SQLite só conhece ASCII: acentos (maiúsculos e minúsculos) são trocados um a um
+_SLUG_LETRAS = {
+    'a': 'áàâãäÁÀÂÃÄ', 'e': 'éèêëÉÈÊË', 'i': 'íìîïÍÌÎÏ', 'o': 'óòôõöÓÒÔÕÖ',
+    'u': 'úùûüÚÙÛÜ', 'c': 'çÇ', 'n': 'ñÑ',
+}
+_SLUG_SEPARADORES = ' \t.,;:!?\'"()[]{}/\\&+#%*@=<>|~^`$_–—…ºª°'
+
+
+def _sql_replace(expr, trocas):
+    for antigo, novo in trocas:
+        expr = f"replace({expr}, {antigo}, {novo})"
+    return expr
+
+
+def _sql_texto(valor):
+    return "'" + valor.replace("'", "''") + "'"
+
+
+def _sql_slug_etapas(por_etapa=20):
+    """UPDATEs que, aplicados em ordem sobre slug = lower(titulo), deixam o slug pronto.
+
+    SQL puro para que o banco continue editável por fora (sem funções Python nos
+    triggers), e em etapas porque o parser do SQLite não aceita tantos replace() aninhados.
+    """
+    trocas = [(_sql_texto(acentuada), _sql_texto(letra))
+              for letra, acentuadas in _SLUG_LETRAS.items() for acentuada in acentuadas]
+    trocas += [(_sql_texto(sep), "'-'") for sep in _SLUG_SEPARADORES]
+    trocas += [("char(10)", "'-'"), ("char(13)", "'-'")]
+    trocas += [("'--'", "'-'")] * 4
+    etapas = [_sql_replace('slug', trocas[i:i + por_etapa]) for i in range(0, len(trocas), por_etapa)]
+    etapas[-1] = f"coalesce(nullif(trim({etapas[-1]}, '-'), ''), '{FEED_SLUG_PADRAO}')"
+    return [f"UPDATE noticias_feed SET slug = {etapa}" for etapa in etapas]
+
+
+def _sql_resumo(expr):
+    """Início do conteúdo em uma linha só, sem espaços repetidos"""
+    trocas = [("char(13)", "' '"), ("char(10)", "' '"), ("char(9)", "' '")] + [("'  '", "' '")] * 3
+    return f"trim(substr({_sql_replace(expr, trocas)}, 1, {FEED_RESUMO}))"
+
+
+def _sql_feed_row(n):
+    return (f"{n}.id, {n}.titulo, {_sql_resumo(f'{n}.conteudo')}, lower({n}.titulo), {n}.autor_id, "
+            f"(SELECT nome FROM users WHERE id = {n}.autor_id), {n}.imagem, {n}.destaque, {n}.data_publicacao")
+
+
+def _sql_feed_upsert():
+    """Corpo dos triggers que (re)escrevem a linha de NEW em noticias_feed"""
+    slug = ''.join(f"\n            {etapa} WHERE id = NEW.id;" for etapa in _sql_slug_etapas())
+    return f"INSERT OR REPLACE INTO noticias_feed VALUES ({_sql_feed_row('NEW')});{slug}"
+
+
+# Migrações versionadas pelo PRAGMA user_version: a migração N leva o banco
+# da versão N-1 para N. Nunca altere uma migração já publicada, crie outra.
+MIGRATIONS = [
+    # 1 - índices para os filtros e ordenações das rotas
+    [
+        "CREATE INDEX IF NOT EXISTS idx_users_tipo_ativo ON users (tipo, ativo)",
+        "CREATE INDEX IF NOT EXISTS idx_users_tipo_nome ON users (tipo, nome)",
+        "CREATE INDEX IF NOT EXISTS idx_users_tipo_created ON users (tipo, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_noticias_destaque_data ON noticias (destaque, data_publicacao)",
+        "CREATE INDEX IF NOT EXISTS idx_noticias_data ON noticias (data_publicacao)",
+        "CREATE INDEX IF NOT EXISTS idx_matriculas_aluno_status ON matriculas (aluno_id, status)",
+    ],
+    # 2 - contadores agregados mantidos por triggers
+    [
+        """CREATE TABLE IF NOT EXISTS estatisticas (
+            chave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL DEFAULT 0
+        )""",
+        *(f"INSERT OR REPLACE INTO estatisticas (chave, valor) VALUES ('{chave}', ({query}))"
+          for chave, query in STATS_QUERIES.items()),
+        """CREATE TRIGGER IF NOT EXISTS trg_users_stats_insert AFTER INSERT ON users
+        WHEN NEW.ativo = 1 BEGIN
+            UPDATE estatisticas SET valor = valor + 1 WHERE chave = NEW.tipo;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_users_stats_delete AFTER DELETE ON users
+        WHEN OLD.ativo = 1 BEGIN
+            UPDATE estatisticas SET valor = valor - 1 WHERE chave = OLD.tipo;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_users_stats_update AFTER UPDATE OF tipo, ativo ON users
+        BEGIN
+            UPDATE estatisticas SET valor = valor - (OLD.ativo = 1) WHERE chave = OLD.tipo;
+            UPDATE estatisticas SET valor = valor + (NEW.ativo = 1) WHERE chave = NEW.tipo;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_stats_insert AFTER INSERT ON noticias BEGIN
+            UPDATE estatisticas SET valor = valor + 1 WHERE chave = 'noticias';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_stats_delete AFTER DELETE ON noticias BEGIN
+            UPDATE estatisticas SET valor = valor - 1 WHERE chave = 'noticias';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_disciplinas_stats_insert AFTER INSERT ON disciplinas BEGIN
+            UPDATE estatisticas SET valor = valor + 1 WHERE chave = 'disciplinas';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_disciplinas_stats_delete AFTER DELETE ON disciplinas BEGIN
+            UPDATE estatisticas SET valor = valor - 1 WHERE chave = 'disciplinas';
+        END""",
+    ],
+    # 3 - versão por notícia e revisão global das notícias (validadores HTTP)
+    [
+        "ALTER TABLE noticias ADD COLUMN versao INTEGER NOT NULL DEFAULT 1",
+        "INSERT OR IGNORE INTO estatisticas (chave, valor) VALUES ('noticias_revisao', 1)",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_revisao_insert AFTER INSERT ON noticias BEGIN
+            UPDATE estatisticas SET valor = valor + 1 WHERE chave = 'noticias_revisao';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_revisao_delete AFTER DELETE ON noticias BEGIN
+            UPDATE estatisticas SET valor = valor + 1 WHERE chave = 'noticias_revisao';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_versao AFTER UPDATE ON noticias
+        WHEN NEW.versao = OLD.versao BEGIN
+            UPDATE noticias SET versao = OLD.versao + 1 WHERE id = NEW.id;
+            UPDATE estatisticas SET valor = valor + 1 WHERE chave = 'noticias_revisao';
+        END""",
+    ],
+    # 4 - busca textual (FTS5) sobre título e conteúdo, ignorando acentos
+    [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS noticias_fts USING fts5(
+            titulo, conteudo,
+            content='noticias', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_fts_insert AFTER INSERT ON noticias BEGIN
+            INSERT INTO noticias_fts (rowid, titulo, conteudo) VALUES (NEW.id, NEW.titulo, NEW.conteudo);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_fts_delete AFTER DELETE ON noticias BEGIN
+            INSERT INTO noticias_fts (noticias_fts, rowid, titulo, conteudo)
+            VALUES ('delete', OLD.id, OLD.titulo, OLD.conteudo);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_fts_update AFTER UPDATE OF titulo, conteudo ON noticias BEGIN
+            INSERT INTO noticias_fts (noticias_fts, rowid, titulo, conteudo)
+            VALUES ('delete', OLD.id, OLD.titulo, OLD.conteudo);
+            INSERT INTO noticias_fts (rowid, titulo, conteudo) VALUES (NEW.id, NEW.titulo, NEW.conteudo);
+        END""",
+        "INSERT INTO noticias_fts (noticias_fts) VALUES ('rebuild')",
+    ],
+    # 5 - sessões no servidor (o cookie leva só o id)
+    [
+        """CREATE TABLE IF NOT EXISTS sessoes (
+            id TEXT PRIMARY KEY,
+            dados TEXT NOT NULL,
+            expira_em REAL NOT NULL
+        ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_sessoes_expira_em ON sessoes (expira_em)",
+    ],
+    # 6 - limites de tentativas compartilhados entre processos (RATE_LIMIT_BACKEND = 'sqlite')
+    [
+        """CREATE TABLE IF NOT EXISTS rate_limits (
+            chave TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            atualizado REAL NOT NULL,
+            expira_em REAL NOT NULL
+        ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_rate_limits_expira_em ON rate_limits (expira_em)",
+    ],
+    # 7 - modelo de leitura das listagens: autor, resumo e slug já calculados, sem o conteúdo
+    # inteiro (mantido por triggers; a página da notícia continua lendo `noticias`)
+    [
+        """CREATE TABLE IF NOT EXISTS noticias_feed (
+            id INTEGER PRIMARY KEY,
+            titulo TEXT NOT NULL,
+            resumo TEXT NOT NULL,
+            slug TEXT NOT NULL,
+            autor_id INTEGER,
+            autor_nome TEXT,
+            imagem TEXT,
+            destaque BOOLEAN NOT NULL DEFAULT 0,
+            data_publicacao TIMESTAMP
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_noticias_feed_data ON noticias_feed (data_publicacao, id)",
+        "CREATE INDEX IF NOT EXISTS idx_noticias_feed_destaque ON noticias_feed (destaque, data_publicacao)",
+        "CREATE INDEX IF NOT EXISTS idx_noticias_feed_autor ON noticias_feed (autor_id)",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_noticias_feed_insert AFTER INSERT ON noticias BEGIN
+            {_sql_feed_upsert()}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_noticias_feed_update
+            AFTER UPDATE OF titulo, conteudo, autor_id, imagem, destaque, data_publicacao ON noticias BEGIN
+            {_sql_feed_upsert()}
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_feed_delete AFTER DELETE ON noticias BEGIN
+            DELETE FROM noticias_feed WHERE id = OLD.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_feed_autor AFTER UPDATE OF nome ON users BEGIN
+            UPDATE noticias_feed SET autor_nome = NEW.nome WHERE autor_id = NEW.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_noticias_feed_autor_delete AFTER DELETE ON users BEGIN
+            UPDATE noticias_feed SET autor_nome = NULL WHERE autor_id = OLD.id;
+        END""",
+        f"INSERT OR REPLACE INTO noticias_feed SELECT {_sql_feed_row('n')} FROM noticias n",
+        *_sql_slug_etapas(),
+    ],
+    # 8 - matrículas por disciplina e carga dos professores (módulo enrollment)
+    [
+        "CREATE INDEX IF NOT EXISTS idx_matriculas_disciplina_status ON matriculas (disciplina_id, status, aluno_id)",
+        "CREATE INDEX IF NOT EXISTS idx_disciplinas_professor ON disciplinas (professor_id, carga_horaria)",
+        "CREATE INDEX IF NOT EXISTS idx_disciplinas_nome ON disciplinas (nome)",
+        # Aluno removido leva junto as matrículas; as órfãs antigas ficam para "flask check-enrollments"
+        """CREATE TRIGGER IF NOT EXISTS trg_matriculas_aluno_delete AFTER DELETE ON users BEGIN
+            DELETE FROM matriculas WHERE aluno_id = OLD.id;
+        END""",
+    ],
+    # 9 - dono de cada sessão: desativar ou remover um usuário encerra as sessões dele
+    [
+        "ALTER TABLE sessoes ADD COLUMN user_id INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_sessoes_user_id ON sessoes (user_id)",
+    ],
+    # 10 - lista de alunos da disciplina paginada pelo índice, sem ordenar a turma inteira
+    [
+        "CREATE INDEX IF NOT EXISTS idx_matriculas_disciplina_aluno ON matriculas (disciplina_id, aluno_id, status)",
+        "DROP INDEX IF EXISTS idx_matriculas_disciplina_status",
+    ],
+    # 11 - importações enviadas pelo painel: rodam fora da requisição e qualquer worker mostra o andamento
+    [
+        """CREATE TABLE IF NOT EXISTS importacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            arquivo TEXT NOT NULL,
+            formato TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'na fila',
+            relatorio TEXT,
+            criada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            concluida_em TIMESTAMP
+        )""",
+    ],
+    # 12 - Last-Modified que anda junto com a ETag: hora da última revisão da notícia e da lista
+    # (inclusive edições e remoções, que não mexem em data_publicacao)
+    [
+        "ALTER TABLE noticias ADD COLUMN atualizado_em TIMESTAMP",
+        "INSERT OR IGNORE INTO estatisticas (chave, valor) "
+        "VALUES ('noticias_atualizado', CAST(strftime('%s', 'now') AS INTEGER))",
+        "DROP TRIGGER IF EXISTS trg_noticias_revisao_insert",
+        "DROP TRIGGER IF EXISTS trg_noticias_revisao_delete",
+        "DROP TRIGGER IF EXISTS trg_noticias_versao",
+        """CREATE TRIGGER trg_noticias_revisao_insert AFTER INSERT ON noticias BEGIN
+            UPDATE estatisticas SET valor = valor + 1 WHERE chave = 'noticias_revisao';
+            UPDATE estatisticas SET valor = CAST(strftime('%s', 'now') AS INTEGER) WHERE chave = 'noticias_atualizado';
+        END""",
+        """CREATE TRIGGER trg_noticias_revisao_delete AFTER DELETE ON noticias BEGIN
+            UPDATE estatisticas SET valor = valor + 1 WHERE chave = 'noticias_revisao';
+            UPDATE estatisticas SET valor = CAST(strftime('%s', 'now') AS INTEGER) WHERE chave = 'noticias_atualizado';
+        END""",
+        """CREATE TRIGGER trg_noticias_versao AFTER UPDATE ON noticias
+        WHEN NEW.versao = OLD.versao BEGIN
+            UPDATE noticias SET versao = OLD.versao + 1, atualizado_em = CURRENT_TIMESTAMP WHERE id = NEW.id;
+            UPDATE estatisticas SET valor = valor + 1 WHERE chave = 'noticias_revisao';
+            UPDATE estatisticas SET valor = CAST(strftime('%s', 'now') AS INTEGER) WHERE chave = 'noticias_atualizado';
+        END""",
+    ],
+]
+
+@contextmanager
+def file_lock(path):
+    """Lock exclusivo entre processos, mantido enquanto o bloco executa"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK desiste após ~10s; espera sem limite, como o flock acima
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class ConnectionPool:
+    """Pool limitado de conexões SQLite reaproveitadas entre requisições"""
+
+    def __init__(self, connect, size=5, timeout=5.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._idle = deque()
+        self._created = 0
+        self._cond = threading.Condition()
+
+        # Contadores para dimensionar o pool
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.discarded = 0
+
+    def acquire(self):
+        """Retira uma conexão saudável do pool, criando ou aguardando se necessário"""
+        deadline = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    if self._is_healthy(conn):
+                        self.hits += 1
+                        return conn
+                    self._discard(conn)
+                    continue
+
+                if self._created < self.size:
+                    self._created += 1
+                    self.misses += 1
+                    break
+
+                if deadline is None:
+                    self.waits += 1
+                    deadline = time.monotonic() + self.timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise sqlite3.OperationalError("Pool de conexões esgotado")
+                self._cond.wait(remaining)
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        """Devolve a conexão ao pool, desfazendo transações pendentes"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            with self._cond:
+                self._discard(conn)
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        """Fecha as conexões ociosas (usado no encerramento do processo)"""
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': self._created - len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'discarded': self.discarded,
+            }
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        self._created -= 1
+        self.discarded += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+class StatsService:
+    """Estatísticas lidas da tabela estatisticas, com cache TTL em memória.
+    
+    Os triggers mantêm os contadores no banco; o cache evita até essa
+    consulta enquanto não expira ou não é invalidado por uma escrita.
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self._cache = None
+        self._expira_em = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, conn):
+        with self._lock:
+            if self._cache is not None and time.monotonic() < self._expira_em:
+                return self._cache
+        valores = dict(conn.execute("SELECT chave, valor FROM estatisticas").fetchall())
+        with self._lock:
+            self._cache = valores
+            self._expira_em = time.monotonic() + self.ttl
+        return valores
+
+    def invalidate(self):
+        with self._lock:
+            self._cache = None
+
+    def check(self, conn):
+        """Recalcula as contagens do zero e devolve {chave: (contador, real)} das divergentes"""
+        contadores = dict(conn.execute("SELECT chave, valor FROM estatisticas").fetchall())
+        divergencias = {}
+        for chave, query in STATS_QUERIES.items():
+            real = conn.execute(query).fetchone()[0]
+            if contadores.get(chave) != real:
+                divergencias[chave] = (contadores.get(chave), real)
+        return divergencias
+
+    def repair(self, conn, divergencias):
+        conn.executemany(
+            "INSERT OR REPLACE INTO estatisticas (chave, valor) VALUES (?, ?)",
+            [(chave, real) for chave, (_, real) in divergencias.items()],
+        )
+        self.invalidate()
+
+
+# Colunas das listagens de notícias (nunca o conteúdo inteiro); use com keyset_page
+FEED_SELECT = ("SELECT id, titulo, resumo, slug, autor_nome, imagem, destaque, data_publicacao "
+               "FROM noticias_feed")
+
+# Consultas do Repository (as mesmas passam pelo "flask check-query-plans")
+FEED_RECENTES_QUERY = f"{FEED_SELECT} ORDER BY data_publicacao DESC LIMIT ?"
+FEED_DESTAQUES_QUERY = f"{FEED_SELECT} WHERE destaque = 1 ORDER BY data_publicacao DESC LIMIT ?"
+ADMIN_DASHBOARD_QUERY = '''
+    SELECT * FROM (
+        SELECT 'noticia' AS registro, id, titulo AS c1, resumo AS c2, slug AS c3, autor_nome AS c4,
+               imagem AS c5, destaque AS c6, data_publicacao AS c7
+        FROM noticias_feed
+        ORDER BY data_publicacao DESC
+        LIMIT ?
+    )
+    UNION ALL
+    SELECT * FROM (
+        SELECT 'aluno', id, nome, username, created_at, NULL, NULL, NULL, NULL
+        FROM users
+        WHERE tipo = 'aluno'
+        ORDER BY created_at DESC
+        LIMIT ?
+    )
+'''
+AREA_ALUNO_QUERY = '''
+    SELECT a.id, a.nome, a.username, a.email, a.telefone, a.data_nascimento,
+           d.nome, d.descricao, p.nome, m.data_matricula
+    FROM users a
+    LEFT JOIN matriculas m ON m.aluno_id = a.id AND m.status = 'ativo'
+    LEFT JOIN disciplinas d ON d.id = m.disciplina_id
+    LEFT JOIN users p ON p.id = d.professor_id
+    WHERE a.id = ?
+'''
+
+# Registros compactos devolvidos pelo Repository (só as colunas que os templates usam)
+NoticiaResumo = namedtuple('NoticiaResumo', 'id titulo resumo slug autor_nome imagem destaque data_publicacao')
+AlunoResumo = namedtuple('AlunoResumo', 'id nome username created_at')
+AlunoPerfil = namedtuple('AlunoPerfil', 'id nome username email telefone data_nascimento')
+MatriculaAtiva = namedtuple('MatriculaAtiva', 'nome descricao professor_nome data_matricula')
+PainelAdmin = namedtuple('PainelAdmin', 'noticias ultimos_alunos')
+PainelAluno = namedtuple('PainelAluno', 'aluno matriculas noticias')
+
+
+class Repository:
+    """Carregadores compostos: tudo o que uma página precisa, no menor número de consultas"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def admin_dashboard(self, limite=5):
+        """Notícias recentes e últimos alunos numa única consulta (UNION ALL)"""
+        rows = self.conn.execute(ADMIN_DASHBOARD_QUERY, (limite, limite)).fetchall()
+        noticias = [NoticiaResumo(*r[1:]) for r in rows if r[0] == 'noticia']
+        alunos = [AlunoResumo(*r[1:5]) for r in rows if r[0] == 'aluno']
+        return PainelAdmin(noticias, alunos)
+
+    def area_aluno(self, aluno_id, limite=5):
+        """Perfil + matrículas ativas (uma consulta) e notícias recentes (outra)"""
+        rows = self.conn.execute(AREA_ALUNO_QUERY, (aluno_id,)).fetchall()
+        if not rows:
+            return None
+        aluno = AlunoPerfil(*rows[0][:6])
+        matriculas = [MatriculaAtiva(*r[6:]) for r in rows if r[6] is not None and r[8] is not None]
+        return PainelAluno(aluno, matriculas, self.news_feed(limite))
+
+    def news_feed(self, limite=5, destaque=False):
+        """Notícias mais recentes (só as em destaque, se pedido) pelo modelo de leitura"""
+        query = FEED_DESTAQUES_QUERY if destaque else FEED_RECENTES_QUERY
+        rows = self.conn.execute(query, (limite,)).fetchall()
+        return [NoticiaResumo(*r) for r in rows]
+
 
 class Database:
-    def __init__(self, db_path='escola_colaco.db'):
+    def __init__(self, db_path='escola_colaco.db', pool_size=5, pool_timeout=5.0, pragmas=None):
         self.db_path = db_path
+        self.pragmas = dict(STORAGE_PROFILE if pragmas is None else pragmas)
+        self.pool = ConnectionPool(self.connect, size=pool_size, timeout=pool_timeout)
+        self._write_lock = threading.Lock()
     
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+    def connect(self):
+        """Abre uma conexão nova já configurada (PRAGMAs aplicados uma única vez)"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=InstrumentedConnection)
         conn.row_factory = sqlite3.Row
+        for nome, valor in self.pragmas.items():
+            conn.execute(f"PRAGMA {nome} = {valor}")
         return conn
     
+    def get_connection(self):
+        """Retira uma conexão do pool; devolva com release_connection()"""
+        return self.pool.acquire()
+    
+    def release_connection(self, conn):
+        self.pool.release(conn)
+    
+    def pool_stats(self):
+        return self.pool.stats()
+    
+    @contextmanager
+    def transaction(self, conn):
+        """Transação de escrita serializada: um escritor por vez neste processo.
+        
+        BEGIN IMMEDIATE reserva o lock de escrita logo no início, e o
+        busy_timeout do perfil cobre a disputa com outros processos.
+        """
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+    
     def init_db(self):
-        """Inicializa o banco de dados com todas as tabelas"""
+        """Inicializa o banco de dados com todas as tabelas e aplica as migrações pendentes.
+        
+        Seguro com vários processos subindo juntos: um de cada vez, sob lock de arquivo.
+        """
+        with file_lock(self.db_path + '.lock'):
+            self._create_schema()
+            self.migrate()
+    
+    def _create_schema(self):
         if not os.path.exists(self.db_path):
-            conn = self.get_connection()
+            conn = self.connect()
             
             # Tabela de usuários
             conn.execute('''
@@ -80,6 +646,24 @@ class Database:
             conn.close()
             print("✅ Banco de dados inicializado com sucesso!")
     
+    def migrate(self):
+        """Aplica, em ordem, as migrações ainda não registradas em user_version"""
+        conn = self.connect()
+        try:
+            versao = conn.execute("PRAGMA user_version").fetchone()[0]
+            for numero in range(versao + 1, len(MIGRATIONS) + 1):
+                with self.transaction(conn):
+                    for statement in MIGRATIONS[numero - 1]:
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {numero}")
+                print(f"✅ Migração {numero} aplicada")
+        finally:
+            conn.close()
+    
+    def explain(self, conn, query, params=()):
+        """Detalhes do EXPLAIN QUERY PLAN de uma consulta"""
+        return [row['detail'] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    
     def _insert_initial_data(self, conn):
         """Insere dados iniciais para teste"""
         # Administrador
@@ -0,0 +1,86 @@
+"""Hash de senhas com custo configurável e verificação num pool limitado de threads"""
+import hmac
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+# Senha inutilizável: nunca confere (nem como texto puro legado)
+UNUSABLE_PASSWORD = '!'
+
+
+class PasswordHasher:
+    """Gera e confere hashes (scrypt/PBKDF2 do Werkzeug).
+    
+    O trabalho pesado roda em `workers` threads; no máximo `max_pending`
+    pedidos esperam na fila, e quem passar disso recebe TimeoutError na hora
+    (ou após `wait_timeout` segundos, se > 0), sem prender a thread HTTP.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', workers=2, max_pending=32, wait_timeout=0.0):
+        self.method = method
+        self.workers = workers
+        self.wait_timeout = wait_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='senhas')
+        self._vagas = threading.BoundedSemaphore(max_pending)
+
+        # Prefixo normalizado do método (ex.: "pbkdf2:sha256:600000") e hash
+        # usado para gastar o mesmo tempo quando o usuário não existe
+        self._dummy = generate_password_hash('senha-inexistente', method=self.method)
+        self.prefix = self._dummy.split('$', 1)[0]
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, method=self.method)
+
+    @contextmanager
+    def bulk(self, processes=None):
+        """Pool de processos só da importação em lote; devolve hash_many(senhas).
+
+        Um processo por CPU (ou `processes`), fora das threads e vagas dos
+        logins, com o mesmo custo de hash. O pool é encerrado ao sair do bloco.
+        """
+        processos = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            def hash_many(passwords):
+                lote = max(1, len(passwords) // (processos * 4))
+                return list(executor.map(generate_password_hash, passwords, repeat(self.method), chunksize=lote))
+            yield hash_many
+
+    def verify(self, stored, password):
+        """Confere a senha; devolve (válida, precisa_rehash)"""
+        if stored is None or stored == UNUSABLE_PASSWORD:
+            self._run(check_password_hash, self._dummy, password)
+            return False, False
+        if not stored.startswith(HASH_PREFIXES):
+            # Senha legada em texto puro: comparação em tempo constante
+            valida = hmac.compare_digest(stored.encode(), password.encode())
+            return valida, valida
+        valida = self._run(check_password_hash, stored, password)
+        return valida, valida and self.needs_rehash(stored)
+
+    def shutdown(self, wait=True):
+        """Encerra o pool de threads (fim do processo)"""
+        self._executor.shutdown(wait=wait)
+
+    def needs_rehash(self, stored):
+        return stored.split('$', 1)[0] != self.prefix
+
+    def _run(self, func, *args, **kwargs):
+        if self.wait_timeout > 0:
+            livre = self._vagas.acquire(timeout=self.wait_timeout)
+        else:
+            livre = self._vagas.acquire(blocking=False)
+        if not livre:
+            raise TimeoutError("Fila de verificação de senhas cheia")
+        try:
+            futuro = self._executor.submit(func, *args, **kwargs)
+        except BaseException:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        return futuro.result()
@@ -0,0 +1,110 @@
+"""Limite de tentativas por IP e por usuário (token bucket), checado antes de tocar no banco"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryRateLimitStore:
+    """Baldes num OrderedDict do processo: O(1) por consulta e memória limitada.
+
+    Um balde que voltaria a ficar cheio equivale a não existir e é descartado;
+    acima de `max_keys`, saem os usados há mais tempo.
+    """
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._baldes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, chave, capacidade, taxa):
+        """Gasta uma ficha; devolve (permitido, segundos até a próxima ficha)"""
+        agora = time.monotonic()
+        with self._lock:
+            balde = self._baldes.pop(chave, None)
+            tokens = capacidade if balde is None else min(capacidade, balde[0] + (agora - balde[1]) * taxa)
+            permitido = tokens >= 1
+            if permitido:
+                tokens -= 1
+            self._baldes[chave] = (tokens, agora, agora + (capacidade - tokens) / taxa)
+
+            # Os mais antigos ficam no início: remove os já recarregados e o excesso
+            while len(self._baldes) > 1:
+                antigo = next(iter(self._baldes.values()))
+                if antigo[2] > agora and len(self._baldes) <= self.max_keys:
+                    break
+                self._baldes.popitem(last=False)
+        return permitido, 0.0 if permitido else (1 - tokens) / taxa
+
+    def __len__(self):
+        return len(self._baldes)
+
+
+class SQLiteRateLimitStore:
+    """Baldes na tabela `rate_limits`, compartilhados entre os processos workers.
+
+    `connection()` devolve a conexão da requisição atual (ex.: get_db).
+    """
+
+    def __init__(self, db, connection, sweep_interval=300):
+        self.db = db
+        self.connection = connection
+        self.sweep_interval = sweep_interval
+        self._ultima_limpeza = time.time()
+
+    def consume(self, chave, capacidade, taxa):
+        agora = time.time()
+        conn = self.connection()
+        with self.db.transaction(conn):
+            row = conn.execute("SELECT tokens, atualizado FROM rate_limits WHERE chave = ?", (chave,)).fetchone()
+            tokens = capacidade if row is None else min(capacidade, row[0] + (agora - row[1]) * taxa)
+            permitido = tokens >= 1
+            if permitido:
+                tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO rate_limits (chave, tokens, atualizado, expira_em) "
+                         "VALUES (?, ?, ?, ?)", (chave, tokens, agora, agora + (capacidade - tokens) / taxa))
+            if agora - self._ultima_limpeza >= self.sweep_interval:
+                conn.execute("DELETE FROM rate_limits WHERE expira_em <= ?", (agora,))
+                self._ultima_limpeza = agora
+        return permitido, 0.0 if permitido else (1 - tokens) / taxa
+
+    def __len__(self):
+        return self.connection().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+class RateLimiter:
+    """Aplica os limites nomeados `{nome: (capacidade, segundos)}`.
+
+    A capacidade é a rajada permitida; as fichas voltam à razão capacidade/segundos.
+    """
+
+    def __init__(self, store, limites):
+        self.store = store
+        self.limites = limites
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.denied = 0
+
+    def hit(self, **chaves):
+        """Consome uma ficha de cada limite (ex.: login_ip='1.2.3.4', login_user='ana').
+
+        Devolve 0 se todos permitirem, senão os segundos a esperar (para o Retry-After).
+        """
+        espera = 0.0
+        for nome, valor in chaves.items():
+            if not valor:
+                continue
+            capacidade, segundos = self.limites[nome]
+            permitido, retry = self.store.consume(f"{nome}:{valor}", capacidade, capacidade / segundos)
+            if not permitido:
+                espera = max(espera, retry)
+        with self._lock:
+            if espera:
+                self.denied += 1
+            else:
+                self.allowed += 1
+        return math.ceil(espera) if espera else 0
+
+    def stats(self):
+        with self._lock:
+            return {'allowed': self.allowed, 'denied': self.denied, 'keys': len(self.store)}
@@ -0,0 +1,174 @@
+"""Sessões no servidor: o cookie leva só um id opaco, os dados ficam no SQLite ou em memória"""
+import secrets
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expira_em=0.0):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expira_em = expira_em
+        self.modified = False
+        self.regenerated = False
+
+    def regenerate(self):
+        """Troca o id no próximo save (evita fixação de sessão no login)"""
+        self.regenerated = True
+        self.modified = True
+
+
+class MemorySessionStore:
+    """Sessões num dicionário do processo (somente para um único processo)"""
+
+    def __init__(self, sweep_interval=300):
+        self.sweep_interval = sweep_interval
+        self._sessoes = {}
+        self._lock = threading.Lock()
+        self._ultima_limpeza = time.time()
+
+    def load(self, sid):
+        with self._lock:
+            sessao = self._sessoes.get(sid)
+        if sessao is None or sessao[1] <= time.time():
+            return None
+        return sessao[:2]
+
+    def save(self, sid, dados, expira_em, user_id=None):
+        with self._lock:
+            self._sessoes[sid] = (dados, expira_em, user_id)
+        self._maybe_sweep()
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessoes.pop(sid, None)
+
+    def delete_user(self, user_id):
+        """Encerra todas as sessões do usuário; devolve quantas eram"""
+        with self._lock:
+            dele = [sid for sid, sessao in self._sessoes.items() if sessao[2] == user_id]
+            for sid in dele:
+                del self._sessoes[sid]
+        return len(dele)
+
+    def sweep(self):
+        agora = time.time()
+        with self._lock:
+            vencidas = [sid for sid, sessao in self._sessoes.items() if sessao[1] <= agora]
+            for sid in vencidas:
+                del self._sessoes[sid]
+            self._ultima_limpeza = agora
+        return len(vencidas)
+
+    def _maybe_sweep(self):
+        if time.time() - self._ultima_limpeza >= self.sweep_interval:
+            self.sweep()
+
+
+class SQLiteSessionStore(MemorySessionStore):
+    """Sessões na tabela `sessoes`, compartilhadas entre processos.
+
+    `connection()` devolve a conexão da requisição atual (ex.: get_db).
+    """
+
+    def __init__(self, db, connection, sweep_interval=300):
+        super().__init__(sweep_interval)
+        self.db = db
+        self.connection = connection
+
+    def load(self, sid):
+        row = self.connection().execute(
+            "SELECT dados, expira_em FROM sessoes WHERE id = ? AND expira_em > ?", (sid, time.time())
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def save(self, sid, dados, expira_em, user_id=None):
+        conn = self.connection()
+        with self.db.transaction(conn):
+            conn.execute("INSERT OR REPLACE INTO sessoes (id, dados, expira_em, user_id) VALUES (?, ?, ?, ?)",
+                         (sid, dados, expira_em, user_id))
+        self._maybe_sweep()
+
+    def delete(self, sid):
+        conn = self.connection()
+        with self.db.transaction(conn):
+            conn.execute("DELETE FROM sessoes WHERE id = ?", (sid,))
+
+    def delete_user(self, user_id):
+        conn = self.connection()
+        with self.db.transaction(conn):
+            return conn.execute("DELETE FROM sessoes WHERE user_id = ?", (user_id,)).rowcount
+
+    def sweep(self):
+        conn = self.connection()
+        with self.db.transaction(conn):
+            removidas = conn.execute("DELETE FROM sessoes WHERE expira_em <= ?", (time.time(),)).rowcount
+        self._ultima_limpeza = time.time()
+        return removidas
+
+
+class ServerSessionInterface(SessionInterface):
+    """Substitui o cookie assinado do Flask por um id aleatório de 256 bits.
+
+    A validade no servidor é `idle_timeout` segundos sem uso; ela só é regravada
+    quando passa da metade, para não escrever no banco a cada requisição.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, idle_timeout=8 * 3600):
+        self.store = store
+        self.idle_timeout = idle_timeout
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            salva = self.store.load(sid)
+            if salva is not None:
+                dados, expira_em = salva
+                return ServerSession(self.serializer.loads(dados), sid, expira_em)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        nome = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(nome, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app))
+            return
+
+        agora = time.time()
+        renovar = session.sid is not None and session.expira_em - agora < self.idle_timeout / 2
+        if not (session.modified or renovar):
+            return
+
+        if session.sid is None or session.regenerated:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.regenerated = False
+        session.expira_em = agora + self.idle_timeout
+        self.store.save(session.sid, self.serializer.dumps(dict(session)), session.expira_em,
+                        session.get('user_id'))
+        response.set_cookie(nome, session.sid,
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path,
+                            secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
@@ -0,0 +1,54 @@
+"""Cache de bytecode do Jinja e pré-compilação dos templates"""
+import os
+import threading
+import time
+
+from jinja2 import BytecodeCache, FileSystemBytecodeCache
+
+
+class MemoryBytecodeCache(BytecodeCache):
+    """Bytecode guardado no processo (útil sem disco gravável; some ao reiniciar)"""
+
+    def __init__(self):
+        self._codigos = {}
+        self._lock = threading.Lock()
+
+    def load_bytecode(self, bucket):
+        with self._lock:
+            codigo = self._codigos.get(bucket.key)
+        if codigo is not None:
+            bucket.bytecode_from_string(codigo)
+
+    def dump_bytecode(self, bucket):
+        codigo = bucket.bytecode_to_string()
+        with self._lock:
+            self._codigos[bucket.key] = codigo
+
+    def clear(self):
+        with self._lock:
+            self._codigos.clear()
+
+
+def make_bytecode_cache(tipo, diretorio=None):
+    """'filesystem' (compartilhado entre workers e reinícios), 'memory' ou None"""
+    if tipo == 'filesystem':
+        os.makedirs(diretorio, exist_ok=True)
+        return FileSystemBytecodeCache(diretorio)
+    if tipo == 'memory':
+        return MemoryBytecodeCache()
+    if tipo is None:
+        return None
+    raise ValueError(f"Cache de bytecode desconhecido: {tipo!r}")
+
+
+def precompile(env, nomes=None):
+    """Carrega todos os templates no ambiente; devolve {nome: segundos}.
+    
+    Com o bytecode em cache, o tempo é o de leitura; sem ele, o da compilação.
+    """
+    tempos = {}
+    for nome in nomes or env.list_templates():
+        inicio = time.perf_counter()
+        env.get_template(nome)
+        tempos[nome] = time.perf_counter() - inicio
+    return tempos
@@ -0,0 +1,207 @@
+"""Ponto de entrada de produção da Escola Colaço
+
+Servidores WSGI externos: use "wsgi:application" (ex.: gunicorn wsgi:application).
+Só com a biblioteca padrão: python wsgi.py --workers 4 --threads 8 --port 8000
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+# Workers que morrem antes disso seguidos indicam erro de inicialização, não queda
+MIN_WORKER_UPTIME = 2.0
+
+
+def create_app(db_path=None):
+    """Aplicação pronta para servir: banco inicializado uma vez (sob lock) e templates compilados"""
+    from app import app, db_manager, precompile_templates
+    if db_path:
+        db_manager.db_path = db_path
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    db_manager.init_db()
+    # No mestre, antes do fork: os workers herdam os templates já carregados
+    tempos = precompile_templates()
+    print(f"📄 {len(tempos)} templates carregados em {sum(tempos.values()) * 1000:.0f} ms")
+    return app
+
+
+def warm_up(app):
+    """Abre as conexões do pool antes de aceitar requisições (templates: ver create_app)"""
+    from app import db_manager, stats
+    conns = [db_manager.get_connection() for _ in range(db_manager.pool.size)]
+    try:
+        for conn in conns:
+            conn.execute("SELECT id FROM users LIMIT 1").fetchall()
+        stats.get(conns[0])
+    finally:
+        for conn in conns:
+            db_manager.release_connection(conn)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGIServer da biblioteca padrão atendendo com um número fixo de threads"""
+
+    def __init__(self, sock, handler, threads):
+        super().__init__(sock.getsockname()[:2], handler, bind_and_activate=False)
+        # Usa o socket já aberto (herdado do processo mestre)
+        self.socket.close()
+        self.socket = sock
+        host, port = sock.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        request.setblocking(True)
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        """Para de aceitar conexões e espera as requisições em andamento"""
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def serve(app, sock, threads, access_log=False):
+    """Aquece e atende no socket até receber SIGTERM/SIGINT (encerramento gracioso)"""
+    warm_up(app)
+    server = PooledWSGIServer(sock, WSGIRequestHandler if access_log else QuietHandler, threads)
+    server.set_app(app)
+
+    def parar(signum, frame):
+        # shutdown() espera o serve_forever terminar: precisa de outra thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, parar)
+    signal.signal(signal.SIGINT, parar)
+    try:
+        server.serve_forever(poll_interval=0.5)
+    finally:
+        server.server_close()
+        from app import db_manager, hasher, images, imports
+        images.shutdown()
+        imports.shutdown()
+        db_manager.pool.close_all()
+        hasher.shutdown()
+
+
+def run(host, port, workers, threads, db_path=None, graceful_timeout=30.0, access_log=False):
+    """Processo mestre: abre o socket, cria os workers com fork e os repõe se caírem"""
+    app = create_app(db_path)
+    sock = socket.create_server((host, port), backlog=1024)
+    # Vários processos aceitam no mesmo socket: quem perder a corrida não pode bloquear
+    sock.setblocking(False)
+
+    print(f"🚀 Escola Colaço em http://{host}:{port} ({workers} worker(s) x {threads} thread(s))")
+    if not hasattr(os, 'fork'):
+        print("⚠️  Sem os.fork (Windows): atendendo em um único processo")
+        serve(app, sock, threads, access_log)
+        return
+
+    filhos = {}
+
+    def criar_worker():
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                serve(app, sock, threads, access_log)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                codigo = 1
+            finally:
+                os._exit(codigo)
+        filhos[pid] = time.monotonic()
+
+    parando = threading.Event()
+
+    def parar(signum, frame):
+        parando.set()
+
+    signal.signal(signal.SIGTERM, parar)
+    signal.signal(signal.SIGINT, parar)
+    for _ in range(workers):
+        criar_worker()
+
+    while not parando.is_set():
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if not pid:
+            parando.wait(0.5)
+            continue
+        inicio = filhos.pop(pid, None)
+        if inicio is None or parando.is_set():
+            continue
+        if time.monotonic() - inicio < MIN_WORKER_UPTIME:
+            print(f"❌ Worker {pid} falhou ao iniciar (status {status}); encerrando", file=sys.stderr)
+            parando.set()
+            break
+        print(f"⚠️  Worker {pid} caiu (status {status}); criando outro", file=sys.stderr)
+        criar_worker()
+
+    # Encerramento gracioso: SIGTERM, espera as requisições em andamento, depois SIGKILL
+    for pid in filhos:
+        os.kill(pid, signal.SIGTERM)
+    prazo = time.monotonic() + graceful_timeout
+    while filhos and time.monotonic() < prazo:
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            filhos.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in filhos:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+    sock.close()
+    print("👋 Servidor encerrado")
+
+
+_application = None
+
+
+def __getattr__(nome):
+    # "wsgi:application" inicializa sob demanda, para que importar o módulo
+    # (ex.: no launcher abaixo) não abra o banco antes do fork. Sem warm_up:
+    # servidores com pré-carga (gunicorn --preload) fazem o fork depois daqui
+    global _application
+    if nome == 'application':
+        if _application is None:
+            _application = create_app()
+        return _application
+    raise AttributeError(nome)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de produção da Escola Colaço (pré-fork)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--db', help="Arquivo do banco (padrão: DATABASE do app)")
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help="Segundos esperando as requisições em andamento ao encerrar")
+    parser.add_argument('--access-log', action='store_true')
+    args = parser.parse_args()
+    run(args.host, args.port, args.workers, args.threads, args.db, args.graceful_timeout, args.access_log)
+
+
+if __name__ == '__main__':
+    main()